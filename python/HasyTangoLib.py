@@ -0,0 +1,880 @@
+#!/usr/bin/env python
+#
+# Helpers shared by the DESY controllers of this package, imported as
+#   from sardana.PoolController import HasyTangoLib
+#
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy
+import PyTango
+
+#
+# Device discovery
+#
+# get_device_exported() replaces the Database().get_device_exported()
+# call made by every RootDeviceName based controller. The results are
+# memorized in the process and stored in a file, so that a Pool restart
+# resolves the device lists without querying the Tango database. A
+# controller which does not find an axis in its list calls
+# refresh_device_exported() to query the database again.
+#
+# The index of a device in its list is an axis index of the controllers.
+# A list queried again therefore keeps the order of the stored list,
+# devices new in the database are appended, devices which are no more
+# exported keep their place. Only the first query, or a query with the
+# cache disabled, returns the order of the database.
+#
+# get_device_names_by_class() and get_device_property() answer the other
+# database queries of the controllers at startup from the same cache.
+#
+# SARDANA_CONTROLLER_CACHE: directory of the cache file,
+#     default ~/.cache/sardana-controllers
+# SARDANA_DEVICE_CACHE_TTL: validity of a cached list in seconds,
+#     default 3600, 0 disables the cache
+#
+DEVICE_CACHE_TTL = 3600.
+DEVICE_CACHE_FILE = "device_cache.json"
+
+_lock = threading.RLock()
+_databases = {}
+_exported = {}
+
+
+def get_cache_dir():
+    return os.environ.get(
+        "SARDANA_CONTROLLER_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache",
+                     "sardana-controllers"))
+
+
+def get_cache_ttl():
+    try:
+        return float(os.environ.get(
+            "SARDANA_DEVICE_CACHE_TTL", DEVICE_CACHE_TTL))
+    except ValueError:
+        return DEVICE_CACHE_TTL
+
+
+def load_cache_file(file_name):
+    file_path = os.path.join(get_cache_dir(), file_name)
+    try:
+        with open(file_path) as fd:
+            return json.load(fd)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_cache_file(file_name, content):
+    """Write the cache atomically, a failure only costs the cache"""
+    cache_dir = get_cache_dir()
+    file_path = os.path.join(cache_dir, file_name)
+    tmp_path = "%s.%d" % (file_path, os.getpid())
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with open(tmp_path, "w") as fd:
+            json.dump(content, fd, indent=1, sort_keys=True)
+        os.replace(tmp_path, file_path)
+    except (IOError, OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def split_tango_host(tango_host):
+    """'haso107d1:10000' -> ('haso107d1', 10000)"""
+    node = tango_host
+    port = 10000
+    if ':' in tango_host:
+        lst = tango_host.split(':')
+        node = lst[0]
+        port = int(lst[1])
+    return node, port
+
+
+def get_database(tango_host=None):
+    """Return a Database, one per TangoHost and process"""
+    with _lock:
+        if tango_host not in _databases:
+            if tango_host is None:
+                _databases[tango_host] = PyTango.Database()
+            else:
+                node, port = split_tango_host(tango_host)
+                _databases[tango_host] = PyTango.Database(node, port)
+        return _databases[tango_host]
+
+
+def _host_key(name, tango_host):
+    if tango_host is None:
+        tango_host = os.environ.get("TANGO_HOST", "")
+    return "%s/%s" % (tango_host, name)
+
+
+def _exported_key(root_device_name, tango_host):
+    return _host_key(root_device_name + "*", tango_host)
+
+
+def _merge_devices(previous, exported):
+    """Return previous followed by the devices of exported it lacks"""
+    return list(previous) + [name for name in exported
+                             if name not in previous]
+
+
+def _load_device_exported(key):
+    entry = _exported.get(key)
+    if entry is None:
+        entry = load_cache_file(DEVICE_CACHE_FILE).get(key)
+    return entry
+
+
+def _query_device_exported(key, root_device_name, tango_host, previous):
+    db = get_database(tango_host)
+    exported = db.get_device_exported(root_device_name + "*").value_string
+    devices = _merge_devices(previous, exported)
+    if get_cache_ttl() > 0 and devices:
+        entry = {"time": time.time(), "devices": devices}
+        _exported[key] = entry
+        content = load_cache_file(DEVICE_CACHE_FILE)
+        content[key] = entry
+        save_cache_file(DEVICE_CACHE_FILE, content)
+    return devices
+
+
+def get_device_exported(root_device_name, tango_host=None):
+    """Return the names of the exported devices RootDeviceName*
+
+    The list comes from the process memo or the cache file if it is
+    younger than the TTL, or else from the Tango database, in the order
+    of the stored list.
+    """
+    key = _exported_key(root_device_name, tango_host)
+    with _lock:
+        ttl = get_cache_ttl()
+        previous = []
+        if ttl > 0:
+            entry = _load_device_exported(key)
+            if entry and entry.get("devices"):
+                if 0 <= time.time() - entry.get("time", 0) < ttl:
+                    _exported[key] = entry
+                    return list(entry["devices"])
+                previous = entry["devices"]
+        return list(_query_device_exported(
+            key, root_device_name, tango_host, previous))
+
+
+def invalidate_device_exported(root_device_name, tango_host=None):
+    """Let a device list expire, the next get_device_exported() queries
+    the database. The order of the list is kept."""
+    key = _exported_key(root_device_name, tango_host)
+    with _lock:
+        if key in _exported:
+            _exported[key] = dict(_exported[key], time=0)
+        content = load_cache_file(DEVICE_CACHE_FILE)
+        if key in content:
+            content[key]["time"] = 0
+            save_cache_file(DEVICE_CACHE_FILE, content)
+
+
+def refresh_device_exported(root_device_name, tango_host, known):
+    """Query the Tango database again, return the exported devices
+    which are not in known, the controller's list, in the order they are
+    to be appended to it. The stored list becomes known followed by
+    them."""
+    key = _exported_key(root_device_name, tango_host)
+    with _lock:
+        previous = known
+        if get_cache_ttl() > 0:
+            entry = _load_device_exported(key)
+            if entry and entry.get("devices"):
+                previous = _merge_devices(known, entry["devices"])
+        devices = _query_device_exported(
+            key, root_device_name, tango_host, previous)
+        return [name for name in devices if name not in known]
+
+
+def _cached_query(key, query, refresh=False):
+    """Return query() from the memo or the cache file if younger than
+    the TTL, the result is stored with the device lists"""
+    with _lock:
+        ttl = get_cache_ttl()
+        if ttl > 0 and not refresh:
+            entry = _load_device_exported(key)
+            if entry and "value" in entry and \
+               0 <= time.time() - entry.get("time", 0) < ttl:
+                _exported[key] = entry
+                return entry["value"]
+        value = query()
+        if ttl > 0:
+            entry = {"time": time.time(), "value": value}
+            _exported[key] = entry
+            content = load_cache_file(DEVICE_CACHE_FILE)
+            content[key] = entry
+            save_cache_file(DEVICE_CACHE_FILE, content)
+        return value
+
+
+def get_device_names_by_class(class_name, tango_host=None, refresh=False):
+    """Return the names of the devices of a class, from one database
+    query instead of a scan of all servers, cached like the device
+    lists. refresh queries the database again."""
+    def query():
+        db = get_database(tango_host)
+        return list(db.get_device_name("*", class_name).value_string)
+
+    key = "class %s" % _host_key(class_name, tango_host)
+    return list(_cached_query(key, query, refresh))
+
+
+def get_device_property(device_name, prop_name, tango_host=None,
+                        refresh=False):
+    """Return the values of a device property as a list, cached like
+    the device lists. refresh queries the database again."""
+    def query():
+        db = get_database(tango_host)
+        return list(db.get_device_property(
+            device_name, [prop_name])[prop_name])
+
+    key = "property %s/%s" % (_host_key(device_name, tango_host), prop_name)
+    return list(_cached_query(key, query, refresh))
+
+
+#
+# DeviceProxy pool
+#
+# get_proxy() hands out one shared proxy per fully qualified device name,
+# the underlying DeviceProxy is created at the first call made through
+# it. release_proxy() drops the proxy when its last user is gone.
+#
+_proxies = {}
+# DeviceProxy methods which do not talk to the device, or complete a
+# request which is already counted
+_LOCAL_CALLS = set([
+    "name", "dev_name", "get_timeout_millis", "set_timeout_millis",
+    "read_attributes_reply", "command_inout_reply"])
+
+
+def full_device_name(device_name):
+    """'p09/motor/eh.01' -> 'haso107d1:10000/p09/motor/eh.01'"""
+    name = device_name.strip()
+    if name.lower().startswith("tango://"):
+        name = name[len("tango://"):]
+    if name.count('/') < 3:
+        tango_host = os.environ.get("TANGO_HOST")
+        if tango_host:
+            name = "%s/%s" % (tango_host.split(',')[0], name)
+    return name.lower()
+
+
+class PooledProxy(object):
+    """Shared DeviceProxy, connected at the first use"""
+
+    def __init__(self, device_name, key):
+        self.__dict__["_device_name"] = device_name
+        self.__dict__["_key"] = key
+        self.__dict__["_proxy"] = None
+        self.__dict__["_refcount"] = 0
+
+    def _get_proxy(self):
+        proxy = self.__dict__["_proxy"]
+        if proxy is None:
+            with _lock:
+                proxy = self.__dict__["_proxy"]
+                if proxy is None:
+                    proxy = PyTango.DeviceProxy(self._device_name)
+                    self.__dict__["_proxy"] = proxy
+        return proxy
+
+    def __getattr__(self, name):
+        value = getattr(self._get_proxy(), name)
+        if name in _LOCAL_CALLS:
+            return value
+        if callable(value):
+            def call(*args, **kwargs):
+                count_round_trip()
+                return value(*args, **kwargs)
+            return call
+        # attribute read by name
+        count_round_trip()
+        return value
+
+    def __setattr__(self, name, value):
+        count_round_trip()
+        setattr(self._get_proxy(), name, value)
+
+    def __repr__(self):
+        return "PooledProxy(%s)" % self._device_name
+
+
+def get_proxy(device_name):
+    """Return the shared proxy of a device
+
+    Every get_proxy() should be matched by a release_proxy(), e.g. in
+    DeleteDevice() for axis proxies or in __del__() for the proxies of
+    the controller.
+    """
+    key = full_device_name(device_name)
+    with _lock:
+        proxy = _proxies.get(key)
+        if proxy is None:
+            proxy = PooledProxy(device_name, key)
+            _proxies[key] = proxy
+        proxy.__dict__["_refcount"] += 1
+        return proxy
+
+
+def release_proxy(proxy):
+    if proxy is None:
+        return
+    with _lock:
+        proxy.__dict__["_refcount"] -= 1
+        if proxy.__dict__["_refcount"] > 0 or \
+           _proxies.get(proxy._key) is not proxy:
+            return
+        del _proxies[proxy._key]
+    _state_cache.unsubscribe(proxy)
+
+
+#
+# Concurrent reads and commands
+#
+def read_attributes_all(requests, max_pending=None, timeout=0):
+    """Read attributes from several devices concurrently
+
+    requests is a list of (proxy, attribute names). The reads are sent
+    as asynchronous requests, at most max_pending at a time (None: all
+    at once), and the replies are waited for timeout ms (0: no limit).
+    Returns, in the order of the requests, the list of DeviceAttribute
+    or the exception raised for that device.
+    """
+    results = [None] * len(requests)
+    if not max_pending or max_pending < 0:
+        max_pending = len(requests) or 1
+    for first in range(0, len(requests), max_pending):
+        pending = []
+        for i in range(first, min(first + max_pending, len(requests))):
+            proxy, names = requests[i]
+            try:
+                pending.append(
+                    (i, proxy, proxy.read_attributes_asynch(list(names))))
+            except Exception as exc:
+                results[i] = exc
+        for i, proxy, req_id in pending:
+            try:
+                results[i] = proxy.read_attributes_reply(req_id, timeout)
+            except Exception as exc:
+                results[i] = exc
+    return results
+
+
+def command_inout_all(requests, timeout=0):
+    """Execute commands on several devices concurrently
+
+    requests is a list of (proxy, command name). Returns, in the order
+    of the requests, the command result or the exception raised.
+    """
+    results = [None] * len(requests)
+    pending = []
+    for i, (proxy, command) in enumerate(requests):
+        try:
+            pending.append((i, proxy, proxy.command_inout_asynch(command)))
+        except Exception as exc:
+            results[i] = exc
+    for i, proxy, req_id in pending:
+        try:
+            results[i] = proxy.command_inout_reply(req_id, timeout)
+        except Exception as exc:
+            results[i] = exc
+    return results
+
+
+#
+# Configuration writes
+#
+# A controller keeps per device a dict of the attribute values it wrote
+# last, filled once from the device by read_written(), and sends with
+# write_changed() only the values differing from it.
+#
+def read_written(proxy, names):
+    """Return {name: value} of the attributes which could be read"""
+    written = {}
+    try:
+        attrs = proxy.read_attributes(list(names))
+    except Exception:
+        return written
+    for name, attr in zip(names, attrs):
+        if not attr.has_failed:
+            written[name] = attr.value
+    return written
+
+
+def write_changed(proxy, written, values):
+    """Write the (name, value) pairs differing from written in one
+    write_attributes call, return the names written
+    """
+    changed = [(name, value) for name, value in values
+               if name not in written or written[name] != value]
+    if changed:
+        try:
+            proxy.write_attributes(changed)
+        except Exception:
+            # the device state is unknown, write all values next time
+            for name, value in changed:
+                written.pop(name, None)
+            raise
+        written.update(changed)
+    return [name for name, value in changed]
+
+
+#
+# Device capabilities
+#
+# get_capabilities() returns the attribute and command lists of a device
+# from a profile cached per TangoHost, device class and server instance
+# (server_id, executable/instance), in the process and in a file. The
+# key is per server instance because different servers may export the
+# same class with different interfaces, e.g. the two GalilDMCMotor
+# servers. The first device of a profile seen by the process verifies
+# it against its attribute list, a different interface replaces it.
+#
+CAPABILITY_CACHE_FILE = "capability_cache.json"
+
+_capabilities = {}
+_capabilities_verified = set()
+
+
+def _introspect(proxy, dev_class, attributes=None):
+    if attributes is None:
+        attributes = sorted(proxy.get_attribute_list())
+    return {
+        "dev_class": dev_class,
+        "attributes": attributes,
+        "commands": sorted(
+            cmd.cmd_name for cmd in proxy.command_list_query()),
+        "time": time.time()}
+
+
+def get_capabilities(proxy, tango_host=None):
+    """Return {"dev_class": ..., "attributes": [...], "commands": [...]}
+
+    Costs one info() call per device if the server profile is cached.
+    """
+    info = proxy.info()
+    if tango_host is None:
+        tango_host = os.environ.get("TANGO_HOST", "")
+    key = "%s/%s/%s" % (tango_host, info.dev_class, info.server_id)
+    with _lock:
+        profile = _capabilities.get(key)
+        if profile is None:
+            profile = load_cache_file(CAPABILITY_CACHE_FILE).get(key)
+        if profile is None:
+            profile = _introspect(proxy, info.dev_class)
+            _capabilities_verified.add(key)
+            _save_capabilities(key, profile)
+        elif key not in _capabilities_verified:
+            attributes = sorted(proxy.get_attribute_list())
+            if attributes != profile["attributes"]:
+                profile = _introspect(proxy, info.dev_class, attributes)
+                _save_capabilities(key, profile)
+            _capabilities_verified.add(key)
+        _capabilities[key] = profile
+        return profile
+
+
+def _save_capabilities(key, profile):
+    content = load_cache_file(CAPABILITY_CACHE_FILE)
+    content[key] = profile
+    save_cache_file(CAPABILITY_CACHE_FILE, content)
+
+
+#
+# Attribute cache
+#
+class AttributeCache(object):
+    """Last known values of device attributes
+
+    An attribute is subscribed to change events at its first read. While
+    the events arrive the cached value is used, if the subscription is
+    not possible (events not configured) a value is read again when it
+    is older than max_age seconds. Values older than max_stale seconds
+    are never used, even with events, None disables this limit.
+    """
+
+    def __init__(self, max_age=1., max_stale=None, use_events=True):
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self.use_events = use_events
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        # (proxy, attr) -> (value, time)
+        self._values = {}
+        # (proxy, attr) -> event id, None if the subscription failed
+        self._events = {}
+        # (proxy, attr) -> number of changes by events, writes and
+        # invalidations, a read does not store a value older than these
+        self._changes = {}
+
+    def _changed(self, key):
+        self._changes[key] = self._changes.get(key, 0) + 1
+
+    def _subscribe(self, proxy, attr, key):
+        # called without holding the lock, the first event may be pushed
+        # by another thread before subscribe_event() returns
+
+        def push_event(event):
+            with self._lock:
+                self._changed(key)
+                if event.err or event.attr_value is None:
+                    self._values.pop(key, None)
+                else:
+                    self._values[key] = (event.attr_value.value, time.time())
+
+        try:
+            event_id = proxy.subscribe_event(
+                attr, PyTango.EventType.CHANGE_EVENT, push_event, [], False)
+        except Exception:
+            return
+        with self._lock:
+            self._events[key] = event_id
+
+    def _is_valid(self, key, value_time):
+        age = time.time() - value_time
+        if self.max_stale is not None and age > self.max_stale:
+            return False
+        return self._events.get(key) is not None or age <= self.max_age
+
+    def read(self, proxy, attr):
+        key = (proxy, attr.lower())
+        with self._lock:
+            subscribe = key not in self._events
+            if subscribe:
+                self._events[key] = None
+        if subscribe and self.use_events:
+            self._subscribe(proxy, attr, key)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and self._is_valid(key, entry[1]):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            changes = self._changes.get(key, 0)
+        value = proxy.read_attribute(attr).value
+        with self._lock:
+            if self._changes.get(key, 0) == changes:
+                self._values[key] = (value, time.time())
+            elif key in self._values:
+                # changed by an event or a write during the read
+                return self._values[key][0]
+        return value
+
+    def write(self, proxy, attr, value):
+        proxy.write_attribute(attr, value)
+        # the device may clamp or round the value, the next read takes
+        # the value it accepted
+        self.invalidate(proxy, attr)
+
+    def update(self, proxy, attr, value):
+        key = (proxy, attr.lower())
+        with self._lock:
+            self._changed(key)
+            self._values[key] = (value, time.time())
+
+    def invalidate(self, proxy, attr=None):
+        with self._lock:
+            # also the keys being read, a read started before the
+            # invalidation does not store its value
+            for key in set(self._values) | set(self._events):
+                if key[0] is proxy and (attr is None or
+                                        key[1] == attr.lower()):
+                    self._changed(key)
+                    self._values.pop(key, None)
+
+    def unsubscribe(self, proxy):
+        with self._lock:
+            event_ids = []
+            for key in list(self._events):
+                if key[0] is proxy:
+                    event_ids.append(self._events.pop(key))
+            self.invalidate(proxy)
+        # not holding the lock: unsubscribe_event() waits for a running
+        # push_event(), which needs it
+        for event_id in event_ids:
+            if event_id is not None:
+                try:
+                    proxy.unsubscribe_event(event_id)
+                except Exception:
+                    pass
+
+    def hit_rate(self):
+        if self.hits + self.misses == 0:
+            return 0.
+        return float(self.hits) / (self.hits + self.misses)
+
+
+#
+# State cache
+#
+# read_state(proxy, True) answers from a cache shared by all controllers
+# of the process. The State attributes are subscribed to change events,
+# without events they are polled at most every STATE_POLL_PERIOD s and
+# no state older than STATE_MAX_STALE s is used. Controllers call
+# invalidate_state() when they start a device, so that the first poll
+# after a start reads the device.
+#
+STATE_POLL_PERIOD = 0.1
+STATE_MAX_STALE = 3.
+
+_state_cache = AttributeCache(
+    max_age=STATE_POLL_PERIOD, max_stale=STATE_MAX_STALE)
+
+
+def read_state(proxy, use_cache=False):
+    if not use_cache:
+        return proxy.command_inout("State")
+    return _state_cache.read(proxy, "State")
+
+
+def invalidate_state(proxy):
+    if proxy is not None:
+        _state_cache.invalidate(proxy)
+
+
+def get_state_cache_stats():
+    return {"hits": _state_cache.hits,
+            "misses": _state_cache.misses,
+            "hit_rate": _state_cache.hit_rate()}
+
+
+#
+# Call statistics
+#
+# The instrument class decorator times the hot path methods of a
+# controller and counts the Tango round trips made through pooled
+# proxies while they run. Controllers which talk to their devices by
+# other proxies are decorated with instrument(round_trips=False), their
+# round trips are reported as null. The controller answers SendToCtrl with
+#   "stats"              the statistics as JSON
+#   "stats reset"        clears them
+#   "stats dump <file>"  writes them to a JSON file
+#
+STATS_METHODS = (
+    "StateOne", "StateAll", "ReadOne", "ReadAll", "LoadOne",
+    "PreStartOne", "StartOne", "StartAll", "AbortOne", "Calc")
+# upper bounds (s) of the latency histogram bins, the last bin is open
+STATS_BINS = (
+    1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1., 3.)
+
+_current = threading.local()
+
+
+def count_round_trip():
+    round_trips = getattr(_current, "round_trips", None)
+    if round_trips:
+        round_trips[-1] += 1
+
+
+class CallStats(object):
+    """Latency histograms and round trip counts per method"""
+
+    def __init__(self, round_trips=True):
+        # False if the round trips are not counted
+        self.round_trips = round_trips
+        # the state polling and the acquisition threads record calls
+        self._lock = threading.Lock()
+        self.methods = {}
+        self.start_time = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+            self.start_time = time.time()
+
+    def record(self, method, duration, round_trips):
+        with self._lock:
+            entry = self.methods.get(method)
+            if entry is None:
+                entry = {"calls": 0, "total": 0., "min": duration,
+                         "max": 0., "round_trips": 0,
+                         "histogram": [0] * (len(STATS_BINS) + 1)}
+                self.methods[method] = entry
+            entry["calls"] += 1
+            entry["total"] += duration
+            entry["min"] = min(entry["min"], duration)
+            entry["max"] = max(entry["max"], duration)
+            entry["round_trips"] += round_trips
+            entry["histogram"][
+                bisect.bisect_left(STATS_BINS, duration)] += 1
+
+    def as_dict(self):
+        methods = {}
+        with self._lock:
+            for method, entry in self.methods.items():
+                methods[method] = dict(entry)
+                methods[method]["histogram"] = list(entry["histogram"])
+                methods[method]["mean"] = entry["total"] / entry["calls"]
+                if not self.round_trips:
+                    methods[method]["round_trips"] = None
+        return {"since": self.start_time, "bins": list(STATS_BINS),
+                "methods": methods, "state_cache": get_state_cache_stats()}
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+    def dump(self, file_name):
+        with open(file_name, "w") as fd:
+            json.dump(self.as_dict(), fd, indent=1, sort_keys=True)
+
+
+def get_call_stats(ctrl):
+    stats = ctrl.__dict__.get("_call_stats")
+    if stats is None:
+        with _lock:
+            stats = ctrl.__dict__.get("_call_stats")
+            if stats is None:
+                stats = ctrl.__dict__["_call_stats"] = CallStats(
+                    getattr(ctrl, "_count_round_trips", True))
+    return stats
+
+
+def _timed(name, method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        round_trips = getattr(_current, "round_trips", None)
+        if round_trips is None:
+            round_trips = _current.round_trips = []
+        round_trips.append(0)
+        start_time = time.time()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            duration = time.time() - start_time
+            count = round_trips.pop()
+            if round_trips:
+                round_trips[-1] += count
+            get_call_stats(self).record(name, duration, count)
+    return wrapper
+
+
+def _stats_command(ctrl, args):
+    stats = get_call_stats(ctrl)
+    if not args:
+        return stats.to_json()
+    if args[0].lower() == "reset":
+        stats.reset()
+        return "stats reset"
+    if args[0].lower() == "dump" and len(args) == 2:
+        stats.dump(args[1])
+        return "stats written to %s" % args[1]
+    return "usage: stats [reset|dump <file>]"
+
+
+def instrument(cls=None, round_trips=True):
+    """Class decorator adding call statistics to a controller, used as
+    @instrument or @instrument(round_trips=False)"""
+    if cls is None:
+        return functools.partial(instrument, round_trips=round_trips)
+    cls._count_round_trips = round_trips
+    for name in STATS_METHODS:
+        if name in cls.__dict__:
+            setattr(cls, name, _timed(name, cls.__dict__[name]))
+    send_to_ctrl = cls.__dict__.get("SendToCtrl")
+
+    def SendToCtrl(self, in_data):
+        words = str(in_data).split()
+        if words and words[0].lower() == "stats":
+            return _stats_command(self, words[1:])
+        if send_to_ctrl is not None:
+            return send_to_ctrl(self, in_data)
+        return super(cls, self).SendToCtrl(in_data)
+
+    if send_to_ctrl is not None:
+        SendToCtrl = functools.wraps(send_to_ctrl)(SendToCtrl)
+    cls.SendToCtrl = SendToCtrl
+    return cls
+
+
+#
+# Regions of interest
+#
+def roi_sums(data, starts, ends):
+    """Return the sums of data[start:end] of all regions, as an array
+
+    The regions are evaluated from one cumulative sum of data, their
+    bounds are clipped to the data like slices. The sum is accumulated
+    in int64 for integer data and in float64 otherwise, so neither
+    float32 rounding nor unsigned wrap-around leaks into the differences.
+    """
+    data = numpy.asarray(data).ravel()
+    if numpy.issubdtype(data.dtype, numpy.integer) or \
+            data.dtype == numpy.bool_:
+        dtype = numpy.int64
+    else:
+        dtype = numpy.float64
+    cumsum = numpy.zeros(len(data) + 1, dtype=dtype)
+    numpy.cumsum(data, dtype=dtype, out=cumsum[1:])
+    starts = numpy.clip(numpy.asarray(starts, dtype=int), 0, len(data))
+    ends = numpy.clip(numpy.asarray(ends, dtype=int), 0, len(data))
+    return cumsum[numpy.maximum(ends, starts)] - cumsum[starts]
+
+
+#
+# Statistics of sample streams
+#
+class RunningStatistics(object):
+    """Mean, standard deviation, min, max and integral (the sum) of
+    samples added in blocks
+
+    Each block is reduced with numpy and merged into the totals with
+    the pairwise update of Welford's algorithm, the samples are not
+    kept.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = None
+        self.max = None
+        self.integral = 0.
+
+    def add(self, block):
+        block = numpy.asarray(block, dtype=float).ravel()
+        count = len(block)
+        if count == 0:
+            return
+        mean = block.mean()
+        m2 = ((block - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        block_min = block.min()
+        block_max = block.max()
+        if self.min is None or block_min < self.min:
+            self.min = block_min
+        if self.max is None or block_max > self.max:
+            self.max = block_max
+        self.integral += block.sum()
+
+    @property
+    def std(self):
+        if self.count == 0:
+            return 0.
+        return (self.m2 / self.count) ** 0.5
+
+    def as_tuple(self):
+        """Return (mean, std, min, max, integral), 0 without samples"""
+        if self.count == 0:
+            return (0., 0., 0., 0., 0.)
+        return (float(self.mean), float(self.std), float(self.min),
+                float(self.max), float(self.integral))
@@ -21,9 +21,9 @@
 #
 #############################################################################
 import time
-import numpy
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 import taurus
 
 from sardana import State
@@ -32,6 +32,7 @@ from sardana.pool.controller import CounterTimerController, \
 # from sardana.pool import AcqTriggerType
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class AmptekPX5CounterTimerController(CounterTimerController):
     "This class is the AmptekPX5 Sardana CounterTimerController"
 
@@ -63,6 +64,10 @@ class AmptekPX5CounterTimerController(CounterTimerController):
         self.t1 = time.time()
         self.sca_values = [0] * 16
         self.error_amptek = 0
+        # thresholds of the device and changes not sent yet
+        self.sca_table = None
+        self.sca_staged = {}
+        self.in_transaction = False
 
     def GetAxisExtraPar(self, axis, name):
         # self._log.debug("SetAxisExtraPar() entering...")
@@ -70,14 +75,11 @@ class AmptekPX5CounterTimerController(CounterTimerController):
             raise Exception("Axis parameters are not allowed for axis 1.")
         name = name.lower()
         scai = axis - 1
+        table = self._get_sca_table()
         if name == "lowthreshold":
-            conf = ["SCAI=%d" % scai, "SCAL"]
-            ret = self.amptekPX5.GetTextConfiguration(conf)
+            return table[scai]["SCAL"]
         elif name == "highthreshold":
-            conf = ["SCAI=%d" % scai, "SCAH"]
-            ret = self.amptekPX5.GetTextConfiguration(conf)
-        v = int(ret[1].split("=")[1])
-        return v
+            return table[scai]["SCAH"]
 
     def SetAxisExtraPar(self, axis, name, value):
         # self._log.debug("SetAxisExtraPar() entering...")
@@ -86,21 +88,82 @@ class AmptekPX5CounterTimerController(CounterTimerController):
         name = name.lower()
         scai = axis - 1
         if name == "lowthreshold":
-            conf = ["SCAI=%d" % scai, "SCAH"]
-            ret = self.amptekPX5.GetTextConfiguration(conf)
-            scah = int(ret[1].split("=")[1])
-            conf = ["SCAI=%d" % scai, "SCAL=%d" % value, "SCAH=%d" % scah]
-            for c in conf:
-                # self._log.debug("conf: %s" % repr(c))
-                self.amptekPX5.SetTextConfiguration([c])
+            self.sca_staged.setdefault(scai, {})["SCAL"] = int(value)
         elif name == "highthreshold":
-            conf = ["SCAI=%d" % scai, "SCAL"]
+            self.sca_staged.setdefault(scai, {})["SCAH"] = int(value)
+        if not self.in_transaction:
+            self.commit_configuration()
+
+    def _get_sca_table(self):
+        """Return {scai: {"SCAL": low, "SCAH": high}}, read from the
+        device in one GetTextConfiguration call the first time"""
+        if self.sca_table is None:
+            conf = []
+            for scai in range(1, self.MaxDevice):
+                conf += ["SCAI=%d" % scai, "SCAL", "SCAH"]
             ret = self.amptekPX5.GetTextConfiguration(conf)
-            scal = int(ret[1].split("=")[1])
-            conf = ["SCAI=%d" % scai, "SCAL=%d" % scal, "SCAH=%d" % value]
-            for c in conf:
-                # self._log.debug("conf: %s" % repr(c))
-                self.amptekPX5.SetTextConfiguration([c])
+            table = {}
+            scai = None
+            for item in ret:
+                key, value = item.split("=")
+                key = key.strip().upper()
+                if key == "SCAI":
+                    scai = int(value)
+                    table[scai] = {}
+                elif scai is not None:
+                    table[scai][key] = int(value)
+            self.sca_table = table
+        return self.sca_table
+
+    def begin_configuration(self):
+        """Stage the threshold changes until commit_configuration()"""
+        self.in_transaction = True
+
+    def commit_configuration(self):
+        """Send the staged threshold changes in one SetTextConfiguration
+        call"""
+        self.in_transaction = False
+        if not self.sca_staged:
+            return
+        table = self._get_sca_table()
+        conf = []
+        for scai in sorted(self.sca_staged):
+            sca = dict(table[scai])
+            sca.update(self.sca_staged[scai])
+            conf += ["SCAI=%d" % scai, "SCAL=%d" % sca["SCAL"],
+                     "SCAH=%d" % sca["SCAH"]]
+        staged = self.sca_staged
+        self.sca_staged = {}
+        try:
+            self.amptekPX5.SetTextConfiguration(conf)
+        except Exception:
+            # the thresholds of the device are unknown now
+            self.sca_table = None
+            raise
+        for scai in staged:
+            table[scai].update(staged[scai])
+
+    def discard_configuration(self):
+        """Drop the staged threshold changes"""
+        self.in_transaction = False
+        self.sca_staged = {}
+
+    def SendToCtrl(self, in_data):
+        """begin, commit, discard: threshold configuration transaction,
+        reload: read the thresholds from the device again"""
+        cmd = in_data.strip().lower()
+        if cmd == "begin":
+            self.begin_configuration()
+        elif cmd == "commit":
+            self.commit_configuration()
+        elif cmd == "discard":
+            self.discard_configuration()
+        elif cmd == "reload":
+            self.sca_table = None
+            self._get_sca_table()
+        else:
+            return "Nothing sent"
+        return "Done"
 
     def AddDevice(self, ind):
         pass
@@ -160,6 +223,8 @@ class AmptekPX5CounterTimerController(CounterTimerController):
         return val
 
     def PreStartAll(self):
+        if self.sca_staged:
+            self.commit_configuration()
         try:
             self.amptekPX5.ClearSpectrum()
             self.amptekPX5.LatchGetClearSCA()
@@ -192,6 +257,7 @@ class AmptekPX5CounterTimerController(CounterTimerController):
         self.amptekPX5.Disable()
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class AmptekPX5SoftCounterTimerController(CounterTimerController):
     """This class is the AmptekPX5 Sardana CounterTimerController.
      Its first channel is an acquisition timer.
@@ -208,6 +274,11 @@ class AmptekPX5SoftCounterTimerController(CounterTimerController):
         'deviceName': {Type: str,
                        Description: 'AmptekPX5 Tango device name',
                        DefaultValue: None},
+        'LiveRefreshTime': {Type: float,
+                            Description: 'Period in s of the spectrum '
+                            'reads during the acquisition, 0: read at '
+                            'the end only',
+                            DefaultValue: 0.},
     }
 
     axis_attributes = {
@@ -231,6 +302,10 @@ class AmptekPX5SoftCounterTimerController(CounterTimerController):
         self.icr = None
         self.tcr = None
         self.scas = {}
+        self.sca_values = {}
+        self.elapsedTime = 0
+        self.readTime = 0
+        self.complete = False
 
     def GetAxisExtraPar(self, axis, name):
         self._log.debug("GetAxisExtraPar() entering...")
@@ -248,6 +323,8 @@ class AmptekPX5SoftCounterTimerController(CounterTimerController):
                 "Axis parameters are not allowed for axes 1 and 2.")
         name = name.lower()
         self.scas[axis][name] = value
+        if self.spectrum is not None:
+            self._calc_scas()
 
     def AddDevice(self, ind):
         self._log.debug("AddDevice() entering...")
@@ -289,30 +366,50 @@ class AmptekPX5SoftCounterTimerController(CounterTimerController):
 
     def ReadAll(self):
         self._log.debug("ReadAll(): entering...")
-        # reading only once and only if we are not in the middle of acquisition
-        if self.sta != State.Moving and self.spectrum is None:
-            self.spectrum = self.amptekPX5.read_attribute("Spectrum").value
+        # reading once at the end of the acquisition and, if
+        # LiveRefreshTime is set, periodically during it
+        if self.sta != State.Moving:
+            if not self.complete:
+                self._read_spectrum()
+                self.complete = True
+        elif self.LiveRefreshTime > 0 and \
+                time.time() - self.readTime >= self.LiveRefreshTime:
+            self._read_spectrum()
         self._log.debug("ReadAll(): leaving...")
 
+    def _read_spectrum(self):
+        attrs = self.amptekPX5.read_attributes(
+            ["Spectrum", "FastCount", "SlowCount"])
+        self.spectrum, self.icr, self.tcr = [attr.value for attr in attrs]
+        self.readTime = time.time()
+        if self.acqStartTime is not None:
+            self.elapsedTime = min(
+                self.readTime - self.acqStartTime, self.acqTime)
+        else:
+            self.elapsedTime = self.acqTime
+        self._calc_scas()
+
+    def _calc_scas(self):
+        axes = sorted(self.scas)
+        values = HasyTangoLib.roi_sums(
+            self.spectrum,
+            [self.scas[axis]['lowthreshold'] for axis in axes],
+            [self.scas[axis]['highthreshold'] for axis in axes])
+        self.sca_values = dict(zip(axes, values.tolist()))
+
     def ReadOne(self, ind):
         self._log.debug("ReadOne(%d): entering..." % ind)
         if self.spectrum is None:  # acquisition has not finished yet
             val = 0
         else:
             if ind == 1:  # timer
-                val = self.acqTime
+                val = self.elapsedTime
             elif ind == 2:  # icr
-                if self.icr is None:
-                    self.icr = self.amptekPX5.read_attribute("FastCount").value
                 val = self.icr
             elif ind == 3:  # tcr
-                if self.tcr is None:
-                    self.tcr = self.amptekPX5.read_attribute("SlowCount").value
                 val = self.tcr
-            else:  # calculating software ROIs
-                lowThreshold = self.scas[ind]['lowthreshold']
-                highThreshold = self.scas[ind]['highthreshold']
-                val = numpy.sum(self.spectrum[lowThreshold:highThreshold])
+            else:  # software ROIs
+                val = self.sca_values.get(ind, 0)
         self._log.debug("ReadOne(%d): returning %d" % (ind, val))
         return val
 
@@ -330,8 +427,11 @@ class AmptekPX5SoftCounterTimerController(CounterTimerController):
         self.spectrum = None
         self.icr = None
         self.tcr = None
+        self.sca_values = {}
+        self.complete = False
         self.amptekPX5.Enable()
         self.acqStartTime = time.time()
+        self.readTime = self.acqStartTime
         self.sta = State.Moving
         self.status = "Acquisition was started"
         self._log.debug("StartAllCT(): leaving...")
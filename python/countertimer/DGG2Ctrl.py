@@ -2,25 +2,34 @@
 # 4.9.2019 TN modified ReadOne() to use the elapsed time trick
 #
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 
 from sardana import State, DataAccess
 # from sardana.pool.controller import MotorController
 from sardana.pool.controller import Type, Access, Description
-# from sardana.pool.controller import DefaultValue
+from sardana.pool.controller import DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class DGG2Ctrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " \
         + "for the DGG2 timer"
 
     axis_attributes = {
         'TangoDevice': {Type: str, Access: ReadOnly},
+        'LatencyTime': {
+            Type: float, Access: ReadOnly,
+            Description: 'Latency time loaded with repetitions. The next '
+                         'gate is started by the first read after it '
+                         'elapsed, the latency between gates is this '
+                         'time plus up to one polling period of Sardana, '
+                         'it is not programmed in the DGG2'},
     }
 
     ctrl_properties = {
@@ -30,6 +39,11 @@ class DGG2Ctrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'VerifySampleTime': {
+            Type: bool,
+            Description: 'Read SampleTime with RemainingTime instead '
+                         'of using the value written by LoadOne',
+            DefaultValue: False},
     }
 
     gender = "CounterTimer"
@@ -41,36 +55,55 @@ class DGG2Ctrl(CounterTimerController):
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         CounterTimerController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-        self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
         self.intern_sta = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
-            self.intern_sta.append(State.On)
+        self.sample_time = []
+        # repetitions: gates of the acquisition, gates done, restart
+        # after the latency time
+        self.nb_gates = []
+        self.nb_done = []
+        self.restart_pending = []
+        self.gate_end = []
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
         self.preset_mode = 0  # Trigger with counts
         self._integ_time = None
         self._start_time = None
+        self._repetitions = 1
+        self._latency_time = 0.
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
+        self.intern_sta.append(State.On)
+        self.sample_time.append(None)
+        self.nb_gates.append(1)
+        self.nb_done.append(0)
+        self.restart_pending.append(False)
+        self.gate_end.append(0.)
 
     def AddDevice(self, ind):
         CounterTimerController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -80,13 +113,15 @@ class DGG2Ctrl(CounterTimerController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         CounterTimerController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
+        self.sample_time[ind - 1] = None
 
     def StateOne(self, ind):
         if self.device_available[ind - 1] == 1:
@@ -104,30 +139,89 @@ class DGG2Ctrl(CounterTimerController):
 
     def ReadOne(self, ind):
         if self.device_available[ind - 1] == 1:
-            v = None
-            try:
-                sample_time = \
-                    self.proxy[ind - 1].read_attribute("SampleTime").value
-                remaining_time = \
-                    self.proxy[ind - 1].read_attribute("RemainingTime").value
-                v = sample_time - remaining_time
-            except Exception:
-                self.intern_sta[ind - 1] = State.Fault
-                return v
-            now = time.time()
-            if self._start_time is not None:
-                elapsed_time = now - self._start_time
-            else:
-                elapsed_time = 9999999999.
-            if elapsed_time < self._integ_time:
-                self.intern_sta[ind - 1] = State.Moving
-            else:
-                self.intern_sta[ind - 1] = \
-                    self.proxy[ind - 1].command_inout("State")
+            if self.nb_gates[ind - 1] > 1:
+                return self._read_repetitions(ind)
+            return self._read_gate(ind)
+
+    def _read_repetitions(self, ind):
+        """Return the sample times of the gates finished since the last
+        read and start the next gate once the latency time elapsed"""
+        values = []
+        if self.nb_done[ind - 1] >= self.nb_gates[ind - 1]:
+            # the final read of the acquisition, later reads return
+            # single values
+            self.nb_gates[ind - 1] = 1
+            return values
+        if self.restart_pending[ind - 1]:
+            self._restart_gate(ind)
+            return values
+        v = self._read_gate(ind)
+        if v is None or self.intern_sta[ind - 1] in \
+                (State.Moving, PyTango.DevState.MOVING):
+            return values
+        values.append(v)
+        self.nb_done[ind - 1] += 1
+        if self.nb_done[ind - 1] < self.nb_gates[ind - 1]:
+            self.gate_end[ind - 1] = time.time()
+            self.restart_pending[ind - 1] = True
+            self.intern_sta[ind - 1] = State.Moving
+            self._restart_gate(ind)
+        return values
+
+    def _restart_gate(self, ind):
+        if time.time() - self.gate_end[ind - 1] >= self._latency_time:
+            self._start_gate(ind)
+            self.restart_pending[ind - 1] = False
+
+    def _start_gate(self, ind):
+        if self.preset_mode:
+            self.proxy[ind - 1].command_inout("StartPreset")
+        else:
+            self.proxy[ind - 1].command_inout("Start")
+        self._start_time = time.time()
+
+    def _read_gate(self, ind):
+        v = None
+        now = time.time()
+        if self._start_time is not None:
+            elapsed_time = now - self._start_time
+        else:
+            elapsed_time = 9999999999.
+        sample_time = self.sample_time[ind - 1]
+        running = self._integ_time is not None and \
+            elapsed_time < self._integ_time
+        # the timer counts the sample time written by LoadOne,
+        # in preset mode the gate may close before
+        if running and not self.preset_mode and sample_time is not None:
+            self.intern_sta[ind - 1] = State.Moving
+            return elapsed_time
+        names = ["RemainingTime"]
+        if sample_time is None or self.VerifySampleTime:
+            names.append("SampleTime")
+        if not running:
+            names.append("State")
+        try:
+            attrs = self.proxy[ind - 1].read_attributes(names)
+            if any(attr.has_failed for attr in attrs):
+                raise RuntimeError("DGG2Ctrl: reading %s failed" % names)
+            values = dict(zip(names, [attr.value for attr in attrs]))
+            if "SampleTime" in values:
+                sample_time = values["SampleTime"]
+                self.sample_time[ind - 1] = sample_time
+            v = sample_time - values["RemainingTime"]
+        except Exception:
+            self.intern_sta[ind - 1] = State.Fault
             return v
+        if running:
+            self.intern_sta[ind - 1] = State.Moving
+        else:
+            self.intern_sta[ind - 1] = values["State"]
+        return v
 
     def AbortOne(self, ind):
         if self.device_available[ind - 1] == 1:
+            self.nb_done[ind - 1] = self.nb_gates[ind - 1]
+            self.restart_pending[ind - 1] = False
             self.proxy[ind - 1].command_inout("Stop")
 
     def PreStartAll(self):
@@ -145,12 +239,11 @@ class DGG2Ctrl(CounterTimerController):
 
     def StartAll(self):
         for index in self.wantedCT:
-            if self.preset_mode:
-                self.proxy[index-1].command_inout("StartPreset")
-            else:
-                self.proxy[index-1].command_inout("Start")
-            self._start_time = time.time()
-            self.intern_sta[index-1] = State.Moving
+            self.nb_gates[index - 1] = self._repetitions
+            self.nb_done[index - 1] = 0
+            self.restart_pending[index - 1] = False
+            self._start_gate(index)
+            self.intern_sta[index - 1] = State.Moving
 
     def LoadOne(self, ind, value, repetitions, latency_time):
         if self.device_available[ind - 1] == 1:
@@ -160,7 +253,10 @@ class DGG2Ctrl(CounterTimerController):
             else:
                 self.preset_mode = 0
             self._integ_time = value
+            self._repetitions = repetitions
+            self._latency_time = latency_time
             self.proxy[ind - 1].write_attribute("SampleTime", value)
+            self.sample_time[ind - 1] = value
 
     def GetAxisExtraPar(self, ind, name):
         if self.device_available[ind - 1]:
@@ -168,6 +264,8 @@ class DGG2Ctrl(CounterTimerController):
                 tango_device = self.node + ":" + str(self.port) + "/" + \
                     self.proxy[ind - 1].name()
                 return tango_device
+            elif name == "LatencyTime":
+                return self._latency_time
 
     def SetAxisExtraPar(self, ind, name, value):
         pass
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 # import time
 
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class HasyInterferometerCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for the Interferometers"
@@ -2,6 +2,7 @@
 # import time, os
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana import DataAccess
 # from sardana import State, DataAccess
 from sardana.pool.controller import CounterTimerController
@@ -15,6 +16,7 @@ ReadWrite = DataAccess.ReadWrite
 global last_sta
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class HasyRoIsCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for making RoIs from OneD"
@@ -129,10 +131,10 @@ class HasyRoIsCtrl(CounterTimerController):
             data = self.proxy.Spectrum
         else:
             data = self.proxy.Data
-        for i in range(0, len(self.value)):
-            self.value[i] = 0
-            for j in range(self.RoIs_start[i], self.RoIs_end[i] + 1):
-                self.value[i] = self.value[i] + data[j]
+        # RoIEnd is the last channel of the RoI
+        self.value = HasyTangoLib.roi_sums(
+            data, self.RoIs_start,
+            [end + 1 for end in self.RoIs_end]).tolist()
 
     def ReadOne(self, ind):
         return self.value[ind - 1]
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 # import time, os
@@ -15,6 +16,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class HasyScaCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller for the HasySca"
 #    axis_attributes = {'Offset': {Type: float, Access: ReadWrite}}
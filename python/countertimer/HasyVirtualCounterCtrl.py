@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 # from sardana import pool
 from sardana.pool.controller import CounterTimerController, Type, \
     Description, DefaultValue
@@ -10,6 +11,7 @@ from sardana.PoolController.countertimer.HasyVirtualCounterLib import \
     reset, myread
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class HasyVirtualCounterCtrl(CounterTimerController):
     "This class is a Tango Sardana CounterTimer controller " + \
         "for defined virtual counters"
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 # import time
 
@@ -14,6 +15,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class LimaRoICounterCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " \
         + "for getting the Lima RoIs as counters"
@@ -59,6 +61,14 @@ class LimaRoICounterCtrl(CounterTimerController):
         self.proxy.Start()
         self.roi_id = []
         self.roi_name = []
+        # [roi_id, x, y, width, height] of each axis, the changes are
+        # sent to the device by PreStartAll
+        self.rois = {}
+        self.rois_changed = set()
+        # ROI sums of readCounters not returned yet by ReadOne
+        self.read_cache = {}
+        self.repetitions = 1
+        self.next_frame = 0
 
     def AddDevice(self, ind):
         CounterTimerController.AddDevice(self, ind)
@@ -67,6 +77,7 @@ class LimaRoICounterCtrl(CounterTimerController):
         self.roi_id.append(self.proxy.addNames(name)[0])
         roi = [self.roi_id[ind - 1], 0, 0, 1, 1]
         self.proxy.setRois(roi)
+        self.rois[ind] = roi
 
     def DeleteDevice(self, ind):
         CounterTimerController.DeleteDevice(self, ind)
@@ -99,17 +110,53 @@ class LimaRoICounterCtrl(CounterTimerController):
         pass
 
     def ReadAll(self):
-        pass
+        """Read the counters of all RoIs with one readCounters call,
+        from the first frame not read yet with repetitions"""
+        if self.repetitions > 1:
+            counts = self.proxy.command_inout(
+                "readCounters", self.next_frame)
+        else:
+            counts = self.proxy.command_inout("readCounters", 0)
+        # each RoI and frame gives roi_id, frame, sum, average, std,
+        # min and max, newer Lima versions put the number of frames first
+        if len(counts) % 7 == 1:
+            counts = counts[1:]
+        axis = dict((int(roi_id), ind)
+                    for ind, roi_id in enumerate(self.roi_id, 1))
+        sums = {}
+        for i in range(0, len(counts) - 6, 7):
+            ind = axis.get(int(counts[i]))
+            if ind is None:
+                continue
+            frame = int(counts[i + 1])
+            sums.setdefault(ind, []).append((frame, counts[i + 2]))
+            self.next_frame = max(self.next_frame, frame + 1)
+        for ind, values in sums.items():
+            values.sort()
+            if self.repetitions > 1:
+                self.read_cache.setdefault(ind, []).extend(
+                    value for frame, value in values)
+            else:
+                self.read_cache[ind] = values[0][1]
 
     def ReadOne(self, ind):
-        counts = self.proxy.command_inout("readCounters", 0)
-        return counts[7*(ind - 1) + 2]
+        if self.repetitions > 1:
+            return self.read_cache.pop(ind, [])
+        if ind not in self.read_cache:
+            self.ReadAll()
+        return self.read_cache.pop(ind)
 
     def AbortOne(self, ind):
         pass
 
     def PreStartAll(self):
         self.wantedCT = []
+        if self.rois_changed:
+            roi = []
+            for ind in sorted(self.rois_changed):
+                roi += self.rois[ind]
+            self.proxy.setRois(roi)
+            self.rois_changed = set()
 
     def PreStartOne(self, ind, value):
         return True
@@ -118,43 +165,58 @@ class LimaRoICounterCtrl(CounterTimerController):
         self.wantedCT.append(ind)
 
     def StartAll(self):
-        pass
+        self.read_cache = {}
+        self.next_frame = 0
 
     def LoadOne(self, ind, value, repetitions, latency_time):
-        pass
+        self.repetitions = repetitions
 
     def GetAxisExtraPar(self, ind, name):
         if name == "TangoDevice":
             return self.proxy_name
-        elif name == "RoIx1":
-            roi = self.proxy.getRois(self.roi_name[ind - 1])
-            return roi[1]
+        if ind not in self.rois:
+            self._refresh_rois()
+        if name == "RoIx1":
+            return self.rois[ind][1]
         elif name == "RoIx2":
-            roi = self.proxy.getRois(self.roi_name[ind - 1])
-            return roi[3]
+            return self.rois[ind][3]
         elif name == "RoIy1":
-            roi = self.proxy.getRois(self.roi_name[ind - 1])
-            return roi[2]
+            return self.rois[ind][2]
         elif name == "RoIy2":
-            roi = self.proxy.getRois(self.roi_name[ind - 1])
-            return roi[4]
+            return self.rois[ind][4]
 
     def SetAxisExtraPar(self, ind, name, value):
-        roi = self.proxy.getRois(self.roi_name[ind - 1])
+        if ind not in self.rois:
+            self._refresh_rois()
+        roi = self.rois[ind]
         if name == "RoIx1":
             roi[1] = value
-            self.proxy.setRois(roi)
         elif name == "RoIx2":
             roi[3] = value
-            self.proxy.setRois(roi)
         elif name == "RoIy1":
             roi[2] = value
-            self.proxy.setRois(roi)
         elif name == "RoIy2":
             roi[4] = value
-            self.proxy.setRois(roi)
+        self.rois_changed.add(ind)
+
+    def _refresh_rois(self):
+        """Read the geometry of all RoIs with one getRois call, the
+        changes not sent yet are kept"""
+        names = []
+        for name in self.roi_name:
+            names += name
+        roi = self.proxy.getRois(names)
+        axis = dict((int(roi_id), ind)
+                    for ind, roi_id in enumerate(self.roi_id, 1))
+        for i in range(0, len(roi) - 4, 5):
+            ind = axis.get(int(roi[i]))
+            if ind is not None and ind not in self.rois_changed:
+                self.rois[ind] = list(roi[i:i + 5])
 
     def SendToCtrl(self, in_data):
+        if in_data.strip().lower() == "refresh":
+            self._refresh_rois()
+            return "Done"
         return "Nothing sent"
 
     def __del__(self):
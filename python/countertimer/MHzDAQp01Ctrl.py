@@ -1,12 +1,12 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 # import time
 
 # from sardana import State, DataAccess
 from sardana import DataAccess
 # from sardana.pool.controller import MotorController
-# from sardana.pool.controller import Type, Access, Description, DefaultValue
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
@@ -15,6 +15,7 @@ ReadWrite = DataAccess.ReadWrite
 global last_sta
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class MHzDAQp01Ctrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for the Mythen RoIs"
@@ -32,6 +33,18 @@ class MHzDAQp01Ctrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'SampleAttribute': {
+            Type: str,
+            Description: 'Attribute of the raw sample ring buffer. If set, '
+                         'the axes 1 to 5 are mean, standard deviation, '
+                         'min, max and integral of the samples, computed '
+                         'by the controller',
+            DefaultValue: ""},
+        'SampleCountAttribute': {
+            Type: str,
+            Description: 'Attribute of the number of samples written to '
+                         'the buffer, needed with SampleAttribute',
+            DefaultValue: ""},
     }
 
     gender = "CounterTimer"
@@ -55,6 +68,13 @@ class MHzDAQp01Ctrl(CounterTimerController):
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(proxy_name)
         self.proxy = PyTango.DeviceProxy(proxy_name)
+        if self.SampleAttribute and not self.SampleCountAttribute:
+            raise Exception(
+                "MHzDAQp01Ctrl: SampleAttribute needs SampleCountAttribute")
+        self.read_cache = {}
+        # streaming mode: samples of the buffer already accumulated
+        self.statistics = HasyTangoLib.RunningStatistics()
+        self.nb_samples = 0
         global last_sta
         last_sta = PyTango.DevState.ON
 
@@ -80,13 +100,57 @@ class MHzDAQp01Ctrl(CounterTimerController):
         return tup
 
     def PreReadAll(self):
-        pass
+        self.read_cache = {}
 
     def PreReadOne(self, ind):
         pass
 
     def ReadAll(self):
-        pass
+        if self.SampleAttribute:
+            self._read_samples()
+            return
+        try:
+            attrs = self.proxy.read_attributes(["MeanValue", "StdDevValue"])
+        except Exception:
+            return
+        for ind, attr in zip((1, 2), attrs):
+            if not attr.has_failed:
+                self.read_cache[ind] = attr.value
+
+    def _read_samples(self):
+        """Accumulate the samples written to the ring buffer since the
+        last read"""
+        attrs = self.proxy.read_attributes(
+            [self.SampleCountAttribute, self.SampleAttribute])
+        for attr in attrs:
+            if attr.has_failed:
+                raise Exception(
+                    "MHzDAQp01Ctrl: reading %s failed" % attr.name)
+        count = int(attrs[0].value)
+        samples = attrs[1].value
+        if samples is None:
+            samples = []
+        if count < self.nb_samples:
+            # the device restarted counting
+            self.statistics.reset()
+            self.nb_samples = 0
+        nb_new = count - self.nb_samples
+        if nb_new > len(samples):
+            raise Exception(
+                "MHzDAQp01Ctrl: %d samples overwritten before they were "
+                "read" % (nb_new - len(samples)))
+        if nb_new > 0:
+            first = self.nb_samples % len(samples)
+            last = count % len(samples)
+            if first < last:
+                self.statistics.add(samples[first:last])
+            else:
+                # the new samples wrap around the end of the buffer
+                self.statistics.add(samples[first:])
+                self.statistics.add(samples[:last])
+            self.nb_samples = count
+        for ind, value in enumerate(self.statistics.as_tuple(), 1):
+            self.read_cache[ind] = value
 
     def StartOne(self, ind, value):
         try:
@@ -97,6 +161,10 @@ class MHzDAQp01Ctrl(CounterTimerController):
             self.proxy.command_inout("Start")
 
     def ReadOne(self, ind):
+        if ind in self.read_cache:
+            return self.read_cache[ind]
+        if self.SampleAttribute:
+            return 0.
         try:
             if ind == 1:
                 value = self.proxy.read_attribute("MeanValue").value
@@ -112,6 +180,11 @@ class MHzDAQp01Ctrl(CounterTimerController):
 
     def PreStartAll(self):
         self.wantedCT = []
+        self.statistics.reset()
+        if self.SampleAttribute:
+            # samples written before the start are not accumulated
+            self.nb_samples = int(self.proxy.read_attribute(
+                self.SampleCountAttribute).value)
 
     def PreStartOne(self, ind, pos):
         return True
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 # import time
 
@@ -18,6 +19,7 @@ ReadWrite = DataAccess.ReadWrite
 # It only reads the counts.
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class PSCameraVHRRoIsCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for the SIS3302 RoIs"
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class PiLCGTVFCTimerCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for the PiLCGateTriggeredVFC used as timer"
@@ -51,27 +53,23 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         CounterTimerController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-        self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device += 1
+        # GateLength written by LoadOne
+        self.preset = []
+        for name in self.devices:
+            self._append_device(name)
 
     #############
     # AbortOne ##
@@ -81,12 +79,28 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute('Arm', 0)
 
+    ###################
+    # _append_device ##
+    ###################
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.preset.append(None)
+        self.max_device += 1
+
     ##############
     # AddDevice ##
     ##############
 
     def AddDevice(self, ind):
         CounterTimerController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -102,7 +116,7 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
                             + str(self.tango_device[ind - 1])
                             )
 
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     #################
@@ -111,8 +125,10 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
 
     def DeleteDevice(self, ind):
         CounterTimerController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
+        self.preset[ind - 1] = None
 
     #########################
     # GetExtraAttributePar ##
@@ -136,6 +152,7 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
     def LoadOne(self, ind, value):
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute("GateLength", value)
+            self.preset[ind - 1] = value
 
     ###############
     # PreReadAll ##
@@ -184,11 +201,14 @@ class PiLCGTVFCTimerCtrl(CounterTimerController):
             # Elapsed time can not be read from the device
             # so it is calculated by software.
 
-            setTime = (
-                        self.proxy[ind - 1].
-                        read_attribute("GateLength").
-                        value
-                        )
+            setTime = self.preset[ind - 1]
+            if setTime is None:
+                setTime = (
+                            self.proxy[ind - 1].
+                            read_attribute("GateLength").
+                            value
+                            )
+                self.preset[ind - 1] = setTime
 
             exposureTime = (
                             time.time()
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 
@@ -16,6 +17,7 @@ ReadWrite = DataAccess.ReadWrite
 # for the sis3302 in the MG
 # It only reads the counts.
 
+@HasyTangoLib.instrument(round_trips=False)
 class SIS3302RoisCtrl(CounterTimerController):
     """ This class is the Tango Sardana CounterTimer controller
     for the SIS3302 RoIs
@@ -2,6 +2,7 @@
 # 4.9.2019 TN modified ReadOne() to use the elapsed time trick
 #
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 
@@ -9,13 +10,14 @@ import time
 from sardana import State, DataAccess
 # from sardana.pool.controller import MotorController
 from sardana.pool.controller import Type, Access, Description
-# from sardana.pool.controller import  DefaultValue
+from sardana.pool.controller import DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class SIS3820Ctrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller for the SIS3820"
     axis_attributes = {
@@ -30,6 +32,17 @@ class SIS3820Ctrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'MCSDeviceName': {
+            Type: str,
+            Description: 'The MCS device of the SIS3820 module, used '
+                         'for acquisitions with repetitions',
+            DefaultValue: ""},
+        'MCSCountAttribute': {
+            Type: str,
+            Description: 'Attribute of the MCS device with the number '
+                         'of acquired triggers. Empty: the repetitions '
+                         'are read when the acquisition ended',
+            DefaultValue: ""},
     }
 
     gender = "CounterTimer"
@@ -42,35 +55,56 @@ class SIS3820Ctrl(CounterTimerController):
         self.TangoHost = None
         CounterTimerController.__init__(
             self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
         self.intern_sta = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
-            self.intern_sta.append(State.On)
+        for name in self.devices:
+            self._append_device(name)
+        self.read_axes = []
+        self.read_cache = {}
         self.started = False
         self._integ_time = None
         self._start_time = None
+        # buffered acquisition of several repetitions by the MCS device
+        self.mcs_proxy = None
+        if self.MCSDeviceName:
+            mcs_name = self.MCSDeviceName
+            if self.TangoHost is not None:
+                mcs_name = str(self.node) + (":%s/" % self.port) + mcs_name
+            self.mcs_proxy = HasyTangoLib.get_proxy(mcs_name)
+        # buffered: the running acquisition, _load_buffered: the loaded one
+        self.buffered = False
+        self._load_buffered = False
+        self._repetitions = 1
+        self._latency_time = 0.
+        self._nb_read = {}
+        self._mcs_config = None
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
+        self.intern_sta.append(State.On)
 
     def AddDevice(self, ind):
         CounterTimerController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -80,11 +114,12 @@ class SIS3820Ctrl(CounterTimerController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         CounterTimerController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
@@ -94,16 +129,89 @@ class SIS3820Ctrl(CounterTimerController):
             return tup
 
     def PreReadAll(self):
-        pass
+        self.read_axes = []
+        self.read_cache = {}
 
     def PreReadOne(self, ind):
-        pass
+        if self.device_available[ind - 1] == 1:
+            self.read_axes.append(ind)
+
+    def _integration_done(self):
+        if self._start_time is None or self._integ_time is None:
+            return True
+        return time.time() - self._start_time >= self._integ_time
 
     def ReadAll(self):
-        pass
+        """Read Counts, and State once the integration time elapsed,
+        of all channels with concurrent requests"""
+        if self.buffered:
+            self._read_buffered()
+            return
+        names = ["Counts"]
+        done = self._integration_done()
+        if done:
+            names.append("State")
+        replies = HasyTangoLib.read_attributes_all(
+            [(self.proxy[ind - 1], names) for ind in self.read_axes])
+        for ind, reply in zip(self.read_axes, replies):
+            # a failed read is repeated by ReadOne to set the Fault state
+            if isinstance(reply, Exception) or \
+                    any(attr.has_failed for attr in reply):
+                continue
+            if done:
+                self.intern_sta[ind - 1] = reply[1].value
+            else:
+                self.intern_sta[ind - 1] = State.Moving
+            self.read_cache[ind] = reply[0].value
+
+    def _read_buffered(self):
+        """Read the repetitions acquired by the MCS device since the
+        last read, one CountsArray row per trigger"""
+        names = ["State"]
+        if self.MCSCountAttribute:
+            names.append(self.MCSCountAttribute)
+        attrs = self.mcs_proxy.read_attributes(names)
+        if any(attr.has_failed for attr in attrs):
+            raise RuntimeError("SIS3820Ctrl: reading %s of %s failed" %
+                               (names, self.MCSDeviceName))
+        sta = attrs[0].value
+        if self.MCSCountAttribute:
+            nb_done = min(int(attrs[1].value), self._repetitions)
+        elif sta == PyTango.DevState.MOVING:
+            # the filled rows are not known before the end
+            nb_done = 0
+        else:
+            nb_done = self._repetitions
+        counts = None
+        if self.read_axes and nb_done > min(
+                self._nb_read.get(ind, 0) for ind in self.read_axes):
+            self.mcs_proxy.command_inout("ReadMCS")
+            counts = self.mcs_proxy.read_attribute("CountsArray").value
+        for ind in self.read_axes:
+            first = self._nb_read.get(ind, 0)
+            if counts is None or nb_done <= first:
+                self.read_cache[ind] = []
+            else:
+                self.read_cache[ind] = \
+                    [row[ind - 1] for row in counts[first:nb_done]]
+                self._nb_read[ind] = nb_done
+            if sta == PyTango.DevState.MOVING:
+                self.intern_sta[ind - 1] = State.Moving
+            else:
+                self.intern_sta[ind - 1] = sta
+        if sta != PyTango.DevState.MOVING and counts is None and all(
+                nb_read >= nb_done for nb_read in self._nb_read.values()):
+            # the acquisition ended, all rows are read and this read,
+            # the final one of the Pool, returned no more; ReadOne
+            # returns single values again
+            self.buffered = False
 
     def ReadOne(self, ind):
         if self.device_available[ind - 1] == 1:
+            if ind in self.read_cache:
+                return self.read_cache.pop(ind)
+            if self.buffered:
+                return []
             value = None
             try:
                 value = self.proxy[ind - 1].read_attribute("Counts").value
@@ -127,10 +235,13 @@ class SIS3820Ctrl(CounterTimerController):
 
     def PreStartAll(self):
         self.wantedCT = []
+        self.buffered = self._load_buffered
 
     def PreStartOne(self, ind, value):
         if self.device_available[ind - 1] == 1:
-            self.proxy[ind - 1].command_inout("Reset")
+            # SetupMCS clears the memory of the MCS device
+            if not self.buffered:
+                self.proxy[ind - 1].command_inout("Reset")
             self.intern_sta[ind - 1] = State.Moving
             return True
         else:
@@ -142,10 +253,24 @@ class SIS3820Ctrl(CounterTimerController):
 
     def StartAll(self):
         self.started = True
+        if self.buffered:
+            self._nb_read = dict((ind, 0) for ind in self.wantedCT)
+            self.mcs_proxy.command_inout("SetupMCS")
         self._start_time = time.time()
 
     def LoadOne(self, ind, value, repetitions, latency_time):
         self._integ_time = value
+        self._repetitions = repetitions
+        self._latency_time = latency_time
+        # without MCS device the repetitions are acquired one by one
+        self._load_buffered = self.mcs_proxy is not None and repetitions > 1
+        # the MCS is set up again only if the configuration changed
+        if self._load_buffered and \
+                self._mcs_config != (repetitions, self.max_device):
+            self.mcs_proxy.write_attributes([
+                ("NbAcquisitions", repetitions),
+                ("NbChannels", self.max_device)])
+            self._mcs_config = (repetitions, self.max_device)
 
     def GetAxisExtraPar(self, ind, name):
         if self.device_available[ind - 1]:
@@ -170,6 +295,7 @@ class SIS3820Ctrl(CounterTimerController):
 
     def __del__(self):
         print("Deleting SIS3820Ctrl controller")
+        HasyTangoLib.release_proxy(getattr(self, "mcs_proxy", None))
 
 
 if __name__ == "__main__":
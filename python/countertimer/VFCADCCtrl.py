@@ -1,12 +1,12 @@
 
-import PyTango
+from sardana.PoolController import HasyTangoLib
 
 import time
 
 # from sardana import State, DataAccess
 from sardana import DataAccess
 from sardana.pool.controller import CounterTimerController
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
@@ -14,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class VFCADCCtrl(CounterTimerController):
     "This class is the Tango Sardana Zero D controller for the VFCADC"
 
@@ -32,6 +33,11 @@ class VFCADCCtrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     MaxDevice = 97
@@ -41,23 +47,22 @@ class VFCADCCtrl(CounterTimerController):
         CounterTimerController.__init__(self, inst, props, *args, **kwargs)
 #        print "PYTHON -> CounterTimerController ctor for instance", inst
 
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
 
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
+        self.read_axes = []
+        self.read_cache = {}
         self.started = False
         self.dft_Offset = 0
         self.Offset = []
@@ -67,20 +72,28 @@ class VFCADCCtrl(CounterTimerController):
         self.Polarity = []
         self.dft_FlagReadVoltage = 0
         self.FlagReadVoltage = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
-            self.Offset.append(self.dft_Offset)
-            self.Gain.append(self.dft_Gain)
-            self.Polarity.append(self.dft_Polarity)
-            self.FlagReadVoltage.append(self.dft_FlagReadVoltage)
+        for name in self.devices:
+            self._append_device(name)
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
+        self.Offset.append(self.dft_Offset)
+        self.Gain.append(self.dft_Gain)
+        self.Polarity.append(self.dft_Polarity)
+        self.FlagReadVoltage.append(self.dft_FlagReadVoltage)
 
     def AddDevice(self, ind):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         #  In AddDevice method for index", ind
         CounterTimerController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -90,13 +103,14 @@ class VFCADCCtrl(CounterTimerController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         # In DeleteDevice method for index", ind
         CounterTimerController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
@@ -104,29 +118,45 @@ class VFCADCCtrl(CounterTimerController):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         #    In StateOne method for index", ind
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             tup = (sta, "State from connected Tango device")
             return tup
 
     def PreReadAll(self):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         #     In PreReadAll method"
-        pass
+        self.read_axes = []
+        self.read_cache = {}
 
     def PreReadOne(self, ind):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         # In PreReadOne method for index", ind
-        pass
+        if self.device_available[ind - 1] == 1:
+            self.read_axes.append(ind)
 
     def ReadAll(self):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         #     In ReadAll method"
-        pass
+        requests = []
+        for ind in self.read_axes:
+            if self.FlagReadVoltage[ind - 1] == 1:
+                requests.append((self.proxy[ind - 1], ["Value"]))
+            else:
+                requests.append((self.proxy[ind - 1], ["Counts"]))
+        replies = HasyTangoLib.read_attributes_all(requests)
+        for ind, reply in zip(self.read_axes, replies):
+            # a failed read is repeated by ReadOne to raise the error
+            if isinstance(reply, Exception) or reply[0].has_failed:
+                continue
+            self.read_cache[ind] = reply[0].value
 
     def ReadOne(self, ind):
         #        print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         # In ReadOne method for index", ind
         if self.device_available[ind - 1] == 1:
+            if ind in self.read_cache:
+                return self.read_cache.pop(ind)
             if self.FlagReadVoltage[ind - 1] == 1:
                 return self.proxy[ind - 1].read_attribute("Value").value
             else:
@@ -138,19 +168,25 @@ class VFCADCCtrl(CounterTimerController):
         self.wanted = []
 
     def PreStartOne(self, ind, value):
+        # the channels are reset together by StartAll
         if self.device_available[ind - 1] == 1:
-            self.proxy[ind - 1].command_inout("Reset")
             return True
         else:
             raise RuntimeError("Ctrl Tango's proxy null!!!")
             return False
 
     def StartOne(self, ind, value):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         # print "PYTHON -> VFCADCCtrl/", self.inst_name,": \
         # In StartOne method for index", ind
         self.wanted.append(ind)
 
     def StartAll(self):
+        replies = HasyTangoLib.command_inout_all(
+            [(self.proxy[ind - 1], "Reset") for ind in self.wanted])
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
         self.started = True
         self.start_time = time.time()
 
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 # import time
 
@@ -15,6 +16,7 @@ ReadWrite = DataAccess.ReadWrite
 global last_sta
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class XMCDCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller for the XMCD"
 
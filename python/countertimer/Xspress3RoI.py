@@ -2,11 +2,12 @@
 # import time, os
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana import DataAccess
 # from sardana import State
 from sardana.pool.controller import CounterTimerController
 from sardana.pool.controller import Type, Access, Description
-# from sardana.pool.controller import DefaultValue
+from sardana.pool.controller import DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
@@ -15,6 +16,7 @@ ReadWrite = DataAccess.ReadWrite
 global last_sta
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class Xspress3RoIsCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller" + \
         "for making RoIs from OneD"
@@ -33,6 +35,13 @@ class Xspress3RoIsCtrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'DeadTimeFactorAttribute': {
+            Type: str,
+            Description: 'Attribute of the dead time correction factor '
+                         'of a channel, %d replaced by the channel '
+                         'number, e.g. DeadTimeFactorCh%d. Empty: no '
+                         'correction',
+            DefaultValue: ""},
     }
 
     MaxDevice = 97
@@ -58,6 +67,8 @@ class Xspress3RoIsCtrl(CounterTimerController):
         self.RoIs_end = []
         self.value = []
         self.channel = []
+        self.read_axes = []
+        self.read_cache = {}
         proxy_name = self.RootDeviceName
         if self.TangoHost is not None:
             proxy_name = str(self.node) + \
@@ -97,20 +108,49 @@ class Xspress3RoIsCtrl(CounterTimerController):
         self.proxy.ExposureTime = value
 
     def PreReadAll(self):
-        pass
+        self.read_axes = []
+        self.read_cache = {}
 
     def PreReadOne(self, ind):
-        pass
+        self.read_axes.append(ind)
 
     def ReadAll(self):
-        pass
+        """Read the spectrum of each channel used by the RoIs once, with
+        the dead time correction factors in the same call"""
+        channels = sorted(set(self.channel[ind - 1] for ind in self.read_axes))
+        if not channels:
+            return
+        names = ["DataCh" + str(channel) for channel in channels]
+        if self.DeadTimeFactorAttribute:
+            names += [self.DeadTimeFactorAttribute % channel
+                      for channel in channels]
+        attrs = self.proxy.read_attributes(names)
+        for i, channel in enumerate(channels):
+            axes = [ind for ind in self.read_axes
+                    if self.channel[ind - 1] == channel]
+            values = self._roi_sums(attrs[i].value, axes)
+            if self.DeadTimeFactorAttribute:
+                values = values * attrs[len(channels) + i].value
+            for ind, value in zip(axes, values.tolist()):
+                self.value[ind - 1] = value
+                self.read_cache[ind] = value
+
+    def _roi_sums(self, data, axes):
+        # RoIEnd is the last channel of the RoI
+        return HasyTangoLib.roi_sums(
+            data, [self.RoIs_start[ind - 1] for ind in axes],
+            [self.RoIs_end[ind - 1] + 1 for ind in axes])
 
     def ReadOne(self, ind):
+        if ind in self.read_cache:
+            return self.read_cache.pop(ind)
         attr_name = "DataCh" + str(self.channel[ind - 1])
         data = self.proxy.read_attribute(attr_name).value
-        self.value[ind - 1] = 0
-        for j in range(self.RoIs_start[ind - 1], self.RoIs_end[ind - 1] + 1):
-            self.value[ind - 1] = self.value[ind - 1] + data[j]
+        value = self._roi_sums(data, [ind])
+        if self.DeadTimeFactorAttribute:
+            value = value * self.proxy.read_attribute(
+                self.DeadTimeFactorAttribute % self.channel[ind - 1]).value
+        self.value[ind - 1] = value.tolist()[0]
         return self.value[ind - 1]
 
     def PreStartAll(self):
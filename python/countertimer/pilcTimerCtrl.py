@@ -1,11 +1,12 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import CounterTimerController
 import time
 
 from sardana import DataAccess
 # from sardana import State, DataAccess
 # from sardana.pool.controller import MotorController
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
@@ -16,6 +17,7 @@ ReadWrite = DataAccess.ReadWrite
 # TriggerPulseLength
 
 
+@HasyTangoLib.instrument
 class pilcTimerCtrl(CounterTimerController):
     "This class is the Tango Sardana CounterTimer controller " + \
         "for the PiLCTriggerGenerator used as timer"
@@ -30,6 +32,11 @@ class pilcTimerCtrl(CounterTimerController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     gender = "CounterTimer"
@@ -52,27 +59,25 @@ class pilcTimerCtrl(CounterTimerController):
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         CounterTimerController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-        self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device += 1
+        # TimeTriggerStepSize written by LoadOne
+        self.preset = []
+        # attribute values last written by PreStartOne
+        self.written = []
+        for name in self.devices:
+            self._append_device(name)
 
     #############
     # AbortOne ##
@@ -82,12 +87,29 @@ class pilcTimerCtrl(CounterTimerController):
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute('Arm', 0)
 
+    ###################
+    # _append_device ##
+    ###################
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.written.append({})
+        self.preset.append(None)
+        self.max_device += 1
+
     ##############
     # AddDevice ##
     ##############
 
     def AddDevice(self, ind):
         CounterTimerController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -103,8 +125,11 @@ class pilcTimerCtrl(CounterTimerController):
                             + str(self.tango_device[ind - 1])
                             )
 
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
+        self.written[ind - 1] = HasyTangoLib.read_written(
+            self.proxy[ind - 1],
+            [name for name, value in self._start_config(ind)])
 
     #################
     # DeleteDevice ##
@@ -112,8 +137,11 @@ class pilcTimerCtrl(CounterTimerController):
 
     def DeleteDevice(self, ind):
         CounterTimerController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
+        self.preset[ind - 1] = None
+        self.written[ind - 1] = {}
 
     #########################
     # GetExtraAttributePar ##
@@ -137,6 +165,7 @@ class pilcTimerCtrl(CounterTimerController):
     def LoadOne(self, ind, value, repetitions, latency_time):
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute("TimeTriggerStepSize", value)
+            self.preset[ind - 1] = value
 
     ###############
     # PreReadAll ##
@@ -165,14 +194,23 @@ class pilcTimerCtrl(CounterTimerController):
     ################
 
     def PreStartOne(self, ind, value):
-        self.proxy[ind - 1].write_attribute('TriggerPulseLength', 0.00005)
-        self.proxy[ind - 1].write_attribute('TriggerMode', 2)
-        self.proxy[ind - 1].write_attribute('FileDir', '/tmp')
-        self.proxy[ind - 1].write_attribute('FilePrefix', '.timer' + str(ind))
-        self.proxy[ind - 1].write_attribute('NbTriggers', 1)
+        HasyTangoLib.write_changed(
+            self.proxy[ind - 1], self.written[ind - 1],
+            self._start_config(ind))
 
         return True
 
+    ##################
+    # _start_config ##
+    ##################
+
+    def _start_config(self, ind):
+        return [('TriggerPulseLength', 0.00005),
+                ('TriggerMode', 2),
+                ('FileDir', '/tmp'),
+                ('FilePrefix', '.timer' + str(ind)),
+                ('NbTriggers', 1)]
+
     ############
     # ReadAll ##
     ############
@@ -189,11 +227,14 @@ class pilcTimerCtrl(CounterTimerController):
             # Elapsed time can not be read from the device
             # so it is calculated by software.
 
-            setTime = (
-                        self.proxy[ind - 1].
-                        read_attribute("TimeTriggerStepSize").
-                        value
-                        )
+            setTime = self.preset[ind - 1]
+            if setTime is None:
+                setTime = (
+                            self.proxy[ind - 1].
+                            read_attribute("TimeTriggerStepSize").
+                            value
+                            )
+                self.preset[ind - 1] = setTime
 
             exposureTime = (
                             time.time()
@@ -233,6 +274,7 @@ class pilcTimerCtrl(CounterTimerController):
     #############
 
     def StartOne(self, ind, val):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         if self.device_available[ind - 1] == 1:
             self.wantedCT.append(ind - 1)
 
@@ -242,7 +284,8 @@ class pilcTimerCtrl(CounterTimerController):
 
     def StateOne(self, ind):
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             if sta == PyTango.DevState.ON:
                 status_string = "Timer is in ON state"
             elif sta == PyTango.DevState.MOVING:
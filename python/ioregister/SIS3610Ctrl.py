@@ -31,6 +31,7 @@
 ##########################################################################
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 
 # import time
 
@@ -38,7 +39,7 @@ import PyTango
 from sardana import DataAccess
 from sardana.pool.controller import IORegisterController
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
@@ -47,6 +48,7 @@ ReadWrite = DataAccess.ReadWrite
 # import json
 
 
+@HasyTangoLib.instrument
 class SIS3610Ctrl(IORegisterController):
     "This class is the Tango Sardana Motor controller " \
         "for the SIS3610 IORegister.  "
@@ -67,36 +69,46 @@ class SIS3610Ctrl(IORegisterController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         IORegisterController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
 
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
 
     def AddDevice(self, ind):
         IORegisterController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -106,17 +118,19 @@ class SIS3610Ctrl(IORegisterController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         IORegisterController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
     def StateOne(self, ind):
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             if sta == PyTango.DevState.ON:
                 status_string = "IORegister is in ON state"
             elif sta == PyTango.DevState.FAULT:
@@ -129,6 +143,7 @@ class SIS3610Ctrl(IORegisterController):
             return self.proxy[ind - 1].read_attribute("Value").value
 
     def WriteOne(self, ind, value):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute("Value", value)
 
@@ -1,8 +1,9 @@
 # from sardana import pool
-import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import MotorController, Description, Type
 
 
+@HasyTangoLib.instrument
 class HKLMotorCtrl(MotorController):
     """This class is the Tango Sardana motor controller
     for the HKL axis of the diffractometer device.
@@ -35,21 +36,21 @@ class HKLMotorCtrl(MotorController):
         """
         MotorController.__init__(self, inst, props, *args, **kwargs)
 
-        self.diffrac = PyTango.DeviceProxy(self.DiffracDevName)
+        self.diffrac = HasyTangoLib.get_proxy(self.DiffracDevName)
 
         self.hkl_device = []
 
         h_dev_name = self.DiffracDevName + "-h"
-        self.hkl_device.append(PyTango.DeviceProxy(h_dev_name))
+        self.hkl_device.append(HasyTangoLib.get_proxy(h_dev_name))
 
         k_dev_name = self.DiffracDevName + "-k"
-        self.hkl_device.append(PyTango.DeviceProxy(k_dev_name))
+        self.hkl_device.append(HasyTangoLib.get_proxy(k_dev_name))
 
         l_dev_name = self.DiffracDevName + "-l"
-        self.hkl_device.append(PyTango.DeviceProxy(l_dev_name))
+        self.hkl_device.append(HasyTangoLib.get_proxy(l_dev_name))
 
         hkl_simu_dev_name = self.DiffracDevName + "-sim-hkl"
-        self.hkl_simu_device = PyTango.DeviceProxy(hkl_simu_dev_name)
+        self.hkl_simu_device = HasyTangoLib.get_proxy(hkl_simu_dev_name)
 
         prop = self.diffrac.get_property(['DiffractometerType'])
         for v in prop['DiffractometerType']:
@@ -57,11 +58,14 @@ class HKLMotorCtrl(MotorController):
 
         prop = self.diffrac.get_property(['RealAxisProxies'])
         self.angle_device_name = {}
+        self.angle_device = {}
         self.angle_names = []
         for v in prop['RealAxisProxies']:
             name_list = v.split(":")
             self.angle_names.append(name_list[0])
             self.angle_device_name[name_list[0]] = name_list[1]
+            self.angle_device[name_list[0]] = HasyTangoLib.get_proxy(
+                name_list[1])
 
     def StateOne(self, axis):
         """ Return the state from the h, k or l device.
@@ -155,8 +159,8 @@ class HKLMotorCtrl(MotorController):
             angles_to_set["tth"] = tth
 
         for angle in self.angle_names:
-            angle_dev = PyTango.DeviceProxy(self.angle_device_name[angle])
-            angle_dev.write_attribute("Position", angles_to_set[angle])
+            self.angle_device[angle].write_attribute(
+                "Position", angles_to_set[angle])
 
         self.diffrac.write_attribute("Simulated", 0)
 
@@ -197,7 +201,13 @@ class HKLMotorCtrl(MotorController):
 
     def __del__(self):
         # print "[HKLMotorCtrl]", self.inst_name,": Exiting"
-        pass
+        # __init__ may have failed before all proxies were taken
+        proxies = [getattr(self, "diffrac", None),
+                   getattr(self, "hkl_simu_device", None)]
+        proxies.extend(getattr(self, "hkl_device", []))
+        proxies.extend(getattr(self, "angle_device", {}).values())
+        for proxy in proxies:
+            HasyTangoLib.release_proxy(proxy)
 
 
 if __name__ == "__main__":
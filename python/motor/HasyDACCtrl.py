@@ -1,11 +1,12 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 
 # import time
 
 from sardana import DataAccess
 # from sardana import State, DataAccess
 from sardana.pool.controller import MotorController
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class HasyDACCtrl(MotorController):
     """This class is the Tango Sardana Motor controller
     for standard Hasylab DACs"""
@@ -30,6 +32,11 @@ class HasyDACCtrl(MotorController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     gender = "Motor"
@@ -42,35 +49,40 @@ class HasyDACCtrl(MotorController):
         self.TangoHost = None
         MotorController.__init__(self, inst, props, *args, **kwargs)
 
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
 
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
         self.dft_VoltageMax = 0
         self.VoltageMax = []
         self.dft_VoltageMin = 0
         self.VoltageMin = []
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
+
     def AddDevice(self, ind):
         MotorController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -80,20 +92,22 @@ class HasyDACCtrl(MotorController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
         self.VoltageMax.append(self.dft_VoltageMax)
         self.VoltageMin.append(self.dft_VoltageMin)
 
     def DeleteDevice(self, ind):
         MotorController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
     def StateOne(self, ind):
         status_template = "STATE(%s) LIM+(%s) LIM-(%s)"
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             switchstate = 0
             if sta == PyTango.DevState.ON:
                 status_template = "DAC is iddle"
@@ -123,6 +137,7 @@ class HasyDACCtrl(MotorController):
         return True
 
     def StartOne(self, ind, pos):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         if self.device_available[ind - 1] == 1:
             self.proxy[ind - 1].write_attribute("Voltage", pos)
 
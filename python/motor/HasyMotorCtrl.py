@@ -1,15 +1,17 @@
-import PyTango
+from sardana.PoolController import HasyTangoLib
 
 import os
+import time
 
 from sardana import DataAccess
 from sardana.pool.controller import MotorController
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool.controller import (Memorize, Memorized,
 #                                      NotMemorized, DefaultValue)
 from sardana.pool.controller import Memorize, NotMemorized
 
 
+@HasyTangoLib.instrument
 class HasyMotorCtrl(MotorController):
     """This class is the Tango Sardana Motor controller
     for standard Hasylab Motors.
@@ -38,9 +40,17 @@ class HasyMotorCtrl(MotorController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'ParameterCacheTime': {
+            Type: float,
+            Description: 'Validity (s) of the cached Conversion, velocity '
+            'and acceleration if the device sends no change events',
+            DefaultValue: 1.0},
     }
     ctrl_attributes = {
-        'ExtraParameterName': {Type: str, Access: DataAccess.ReadWrite}}
+        'ExtraParameterName': {Type: str, Access: DataAccess.ReadWrite},
+        # number of position reads ReadAll has pending at a time, 0: all
+        'MaxConcurrentReads': {Type: int, Access: DataAccess.ReadWrite},
+        'ReadAllTiming': {Type: str, Access: DataAccess.ReadOnly}}
 
     attrNames_UnitLimitMax = [
         "UnitLimitMax", "SoftLimitMax", "SoftLimitCw", "SoftCwLimit"]
@@ -69,13 +79,10 @@ class HasyMotorCtrl(MotorController):
         # the next line is because of haso228k (64bit)
         self.TangoHost = None
         MotorController.__init__(self, inst, props, *args, **kwargs)
-        self.db = PyTango.Database()
         self.debugFlag = False
         if os.isatty(1):
             self.debugFlag = True
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             #
             # TangoHost can be hasgksspp07eh3:10000
             #
@@ -85,9 +92,8 @@ class HasyMotorCtrl(MotorController):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
@@ -113,35 +119,60 @@ class HasyMotorCtrl(MotorController):
         self.poolmotor_proxy = []
         self.set_for_memorized_min = []
         self.set_for_memorized_max = []
+        # limits last copied to the Position config of the pool motor
+        self.propagated_min = []
+        self.propagated_max = []
         self.flag_standa = []
-
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.attrName_UnitLimitMax.append(None)
-            self.attrName_UnitLimitMin.append(None)
-            self.attrName_CwLimit.append(None)
-            self.attrName_CcwLimit.append(None)
-            self.attrName_Velocity.append(None)
-            self.attrName_Acceleration.append(None)
-            self.cmdName_Abort.append(None)
-            self.conversion_included.append(False)
-            self.UnitLimitMax.append(self.dft_UnitLimitMax)
-            self.UnitLimitMin.append(self.dft_UnitLimitMin)
-            self.PositionSim.append(self.dft_PositionSim)
-            self.ResultSim.append(self.dft_ResultSim)
-            #  Can not be created in AddDevice because
-            #     the pool motor device does not exist
-            self.poolmotor_proxy.append(None)
-            self.set_for_memorized_min.append(1)
-            self.set_for_memorized_max.append(1)
-            self.flag_standa.append(0)
-
-            self.max_device = self.max_device + 1
+        self.state_axes = []
+        self.state_cache = {}
+        self.read_axes = []
+        self.read_cache = {}
+        self.max_concurrent_reads = 0
+        self.read_all_calls = 0
+        self.read_all_time = 0.
+        self.read_all_time_max = 0.
+        # Conversion, velocity and acceleration, kept by change events
+        # or read again after ParameterCacheTime
+        self.param_cache = HasyTangoLib.AttributeCache(
+            max_age=self.ParameterCacheTime)
+
+        for name in self.devices:
+            self._append_device(name)
+
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.attrName_UnitLimitMax.append(None)
+        self.attrName_UnitLimitMin.append(None)
+        self.attrName_CwLimit.append(None)
+        self.attrName_CcwLimit.append(None)
+        self.attrName_Velocity.append(None)
+        self.attrName_Acceleration.append(None)
+        self.cmdName_Abort.append(None)
+        self.conversion_included.append(False)
+        self.UnitLimitMax.append(self.dft_UnitLimitMax)
+        self.UnitLimitMin.append(self.dft_UnitLimitMin)
+        self.PositionSim.append(self.dft_PositionSim)
+        self.ResultSim.append(self.dft_ResultSim)
+        #  Can not be created in AddDevice because
+        #     the pool motor device does not exist
+        self.poolmotor_proxy.append(None)
+        self.set_for_memorized_min.append(1)
+        self.set_for_memorized_max.append(1)
+        self.propagated_min.append(None)
+        self.propagated_max.append(None)
+        self.flag_standa.append(0)
+
+        self.max_device = self.max_device + 1
 
     def AddDevice(self, ind):
         MotorController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             self.device_available[ind - 1] = 0
@@ -154,12 +185,13 @@ class HasyMotorCtrl(MotorController):
                 str(self.tango_device[ind - 1])
         if self.debugFlag:
             print("HasyMotorCtrl.AddDevice %s index %d" % (proxy_name, ind))
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
-        attrs = self.proxy[ind - 1].get_attribute_list()
-        cmds = [
-            cmd.cmd_name for cmd in self.proxy[ind - 1].command_list_query()]
+        capabilities = HasyTangoLib.get_capabilities(
+            self.proxy[ind - 1], self.TangoHost)
+        attrs = capabilities["attributes"]
+        cmds = capabilities["commands"]
         for attrName in HasyMotorCtrl.attrNames_UnitLimitMax:
             if attrName in attrs:
                 self.attrName_UnitLimitMax[ind - 1] = attrName
@@ -191,46 +223,109 @@ class HasyMotorCtrl(MotorController):
             if cmdName in cmds:
                 self.cmdName_Abort[ind - 1] = cmdName
                 break
-        if self.proxy[ind - 1].info().dev_class in \
+        if capabilities["dev_class"] in \
            HasyMotorCtrl.servers_ConversionIncluded:
             # there are two different GalilDMC servers used at DESY
-            if not (self.proxy[ind - 1].info().dev_class == "GalilDMCMotor"
+            if not (capabilities["dev_class"] == "GalilDMCMotor"
                     and self.attrName_Acceleration[ind - 1] == "SlewRate"):
                 self.conversion_included[ind - 1] = True
 
     def DeleteDevice(self, ind):
         MotorController.DeleteDevice(self, ind)
+        self.param_cache.unsubscribe(self.proxy[ind - 1])
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
+        HasyTangoLib.release_proxy(self.poolmotor_proxy[ind - 1])
+        self.poolmotor_proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
-    def StateOne(self, ind):
-        status_template = "STATE(%s) LIM+(%s) LIM-(%s)"
+    def PreStateAll(self):
+        self.state_axes = []
+        self.state_cache = {}
+
+    def PreStateOne(self, ind):
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            self.state_axes.append(ind)
+
+    def StateAll(self):
+        """Read State and the limit switches of all axes in one pass,
+        one read_attributes request per device, sent concurrently"""
+        requests = []
+        for ind in self.state_axes:
+            names = ["State"]
+            if self.attrName_CwLimit[ind - 1] is not None:
+                names.append(self.attrName_CwLimit[ind - 1])
+            if self.attrName_CcwLimit[ind - 1] is not None:
+                names.append(self.attrName_CcwLimit[ind - 1])
+            requests.append((self.proxy[ind - 1], names))
+        replies = HasyTangoLib.read_attributes_all(requests)
+        for ind, reply in zip(self.state_axes, replies):
+            # a failed read is repeated by StateOne to raise the error
+            if isinstance(reply, Exception) or \
+               any(attr.has_failed for attr in reply):
+                continue
+            values = dict((attr.name.lower(), attr.value) for attr in reply)
             lower = 0
             upper = 0
             if self.attrName_CwLimit[ind - 1] is not None:
-                lower = self.proxy[ind - 1].read_attribute(
-                    self.attrName_CwLimit[ind - 1]).value
+                lower = values[self.attrName_CwLimit[ind - 1].lower()]
             if self.attrName_CcwLimit[ind - 1] is not None:
-                upper = self.proxy[ind - 1].read_attribute(
-                    self.attrName_CcwLimit[ind - 1]).value
+                upper = values[self.attrName_CcwLimit[ind - 1].lower()]
+            self.state_cache[ind] = (values["state"], lower, upper)
+
+    def StateOne(self, ind):
+        status_template = "STATE(%s) LIM+(%s) LIM-(%s)"
+        if self.device_available[ind - 1] == 1:
+            if ind in self.state_cache:
+                sta, lower, upper = self.state_cache.pop(ind)
+            else:
+                sta = self.proxy[ind - 1].command_inout("State")
+                lower = 0
+                upper = 0
+                if self.attrName_CwLimit[ind - 1] is not None:
+                    lower = self.proxy[ind - 1].read_attribute(
+                        self.attrName_CwLimit[ind - 1]).value
+                if self.attrName_CcwLimit[ind - 1] is not None:
+                    upper = self.proxy[ind - 1].read_attribute(
+                        self.attrName_CcwLimit[ind - 1]).value
             switchstate = lower * 4 + upper * 2
             status_string = status_template % (sta, upper, lower)
             tup = (sta, status_string, switchstate)
             return tup
 
     def PreReadAll(self):
-        pass
+        self.read_axes = []
+        self.read_cache = {}
 
     def PreReadOne(self, ind):
-        pass
+        if self.device_available[ind - 1] == 1:
+            self.read_axes.append(ind)
 
     def ReadAll(self):
-        pass
+        """Read the positions of all axes with concurrent requests"""
+        start_time = time.time()
+        requests = []
+        for ind in self.read_axes:
+            if self.flag_standa[ind - 1] == 1:
+                requests.append((self.proxy[ind - 1], ["curPosition"]))
+            else:
+                requests.append((self.proxy[ind - 1], ["Position"]))
+        replies = HasyTangoLib.read_attributes_all(
+            requests, max_pending=self.max_concurrent_reads)
+        for ind, reply in zip(self.read_axes, replies):
+            # a failed read is repeated by ReadOne to raise the error
+            if isinstance(reply, Exception) or reply[0].has_failed:
+                continue
+            self.read_cache[ind] = reply[0].value
+        duration = time.time() - start_time
+        self.read_all_calls += 1
+        self.read_all_time += duration
+        self.read_all_time_max = max(self.read_all_time_max, duration)
 
     def ReadOne(self, ind):
         if self.device_available[ind - 1] == 1:
+            if ind in self.read_cache:
+                return self.read_cache.pop(ind)
             if self.flag_standa[ind - 1] == 1:
                 return self.proxy[ind - 1].read_attribute("curPosition").value
             return self.proxy[ind - 1].read_attribute("Position").value
@@ -254,33 +349,25 @@ class HasyMotorCtrl(MotorController):
             if name == "UnitLimitMax":
                 if self.flag_standa[ind - 1] == 1:
                     return 0
-                if self.poolmotor_proxy[ind - 1] is None:
-                    self.poolmotor_proxy[ind - 1] = PyTango.DeviceProxy(
-                        self.GetAxisName(ind))
                 value = float(self.proxy[ind - 1].read_attribute(
                     self.attrName_UnitLimitMax[ind - 1]).value)
-                cfg = []
-                config = self.poolmotor_proxy[ind - 1].get_attribute_config(
-                    "Position")
-                config.max_value = str(value)
-                cfg.append(config)
-                self.poolmotor_proxy[ind - 1].set_attribute_config(cfg)
+                if str(value) != self.propagated_max[ind - 1]:
+                    # the min limit goes with the same config write
+                    self._propagate_limits(
+                        ind, max_value=value,
+                        min_value=self._read_limit(
+                            ind, self.attrName_UnitLimitMin[ind - 1]))
 
             elif name == "UnitLimitMin":
                 if self.flag_standa[ind - 1] == 1:
                     return 0
-                if self.poolmotor_proxy[ind - 1] is None:
-                    self.poolmotor_proxy[ind - 1] = PyTango.DeviceProxy(
-                        self.GetAxisName(ind))
                 value = float(self.proxy[ind - 1].read_attribute(
                     self.attrName_UnitLimitMin[ind - 1]).value)
-
-                cfg = []
-                config = self.poolmotor_proxy[ind - 1].get_attribute_config(
-                    "Position")
-                config.min_value = str(value)
-                cfg.append(config)
-                self.poolmotor_proxy[ind - 1].set_attribute_config(cfg)
+                if str(value) != self.propagated_min[ind - 1]:
+                    self._propagate_limits(
+                        ind, min_value=value,
+                        max_value=self._read_limit(
+                            ind, self.attrName_UnitLimitMax[ind - 1]))
 
             elif name == "PositionSim":
                 if self.flag_standa[ind - 1] == 1:
@@ -301,8 +388,8 @@ class HasyMotorCtrl(MotorController):
             elif name == "Conversion":
                 if self.flag_standa[ind - 1] == 1:
                     return 0
-                value = float(self.proxy[ind - 1].read_attribute(
-                    "Conversion").value)
+                value = float(self.param_cache.read(
+                    self.proxy[ind - 1], "Conversion"))
         return value
 
     def SetAxisExtraPar(self, ind, name, value):
@@ -310,32 +397,16 @@ class HasyMotorCtrl(MotorController):
             if self.flag_standa[ind - 1] == 1:
                 return
             if name == "UnitLimitMax":
-                if self.poolmotor_proxy[ind - 1] is None:
-                    self.poolmotor_proxy[ind - 1] = PyTango.DeviceProxy(
-                        self.GetAxisName(ind))
                 self.proxy[ind - 1].write_attribute(
                     self.attrName_UnitLimitMax[ind - 1], value)
                 if not self.set_for_memorized_max[ind - 1]:
-                    cfg = []
-                    config = self.poolmotor_proxy[
-                        ind - 1].get_attribute_config("Position")
-                    config.max_value = str(value)
-                    cfg.append(config)
-                    self.poolmotor_proxy[ind - 1].set_attribute_config(cfg)
+                    self._propagate_limits(ind, max_value=value)
                 self.set_for_memorized_max[ind - 1] = 0
             elif name == "UnitLimitMin":
-                if self.poolmotor_proxy[ind - 1] is None:
-                    self.poolmotor_proxy[ind - 1] = PyTango.DeviceProxy(
-                        self.GetAxisName(ind))
                 self.proxy[ind - 1].write_attribute(
                     self.attrName_UnitLimitMin[ind - 1], value)
                 if not self.set_for_memorized_min[ind - 1]:
-                    cfg = []
-                    config = self.poolmotor_proxy[
-                        ind - 1].get_attribute_config("Position")
-                    config.min_value = str(value)
-                    cfg.append(config)
-                    self.poolmotor_proxy[ind - 1].set_attribute_config(cfg)
+                    self._propagate_limits(ind, min_value=value)
                 self.set_for_memorized_min[ind - 1] = 0
 
             elif name == "PositionSim":
@@ -344,8 +415,44 @@ class HasyMotorCtrl(MotorController):
                 self.proxy[ind - 1].write_attribute("ResultSim", value)
             elif name == "Calibrate":
                 self.proxy[ind - 1].command_inout("Calibrate", value)
+                self.param_cache.invalidate(self.proxy[ind - 1])
             elif name == "Conversion":
-                self.proxy[ind - 1].write_attribute("Conversion", value)
+                self.param_cache.write(
+                    self.proxy[ind - 1], "Conversion", value)
+
+    def _read_limit(self, ind, attr_name):
+        if attr_name is None:
+            return None
+        try:
+            return float(self.proxy[ind - 1].read_attribute(attr_name).value)
+        except Exception:
+            return None
+
+    def _propagate_limits(self, ind, max_value=None, min_value=None):
+        """Copy the limits to the Position config of the pool motor.
+        Only the limits which changed since the last copy are sent, both
+        in one set_attribute_config call."""
+        changes = {}
+        if max_value is not None and \
+           str(max_value) != self.propagated_max[ind - 1]:
+            changes["max_value"] = str(max_value)
+        if min_value is not None and \
+           str(min_value) != self.propagated_min[ind - 1]:
+            changes["min_value"] = str(min_value)
+        if not changes:
+            return
+        if self.poolmotor_proxy[ind - 1] is None:
+            self.poolmotor_proxy[ind - 1] = HasyTangoLib.get_proxy(
+                self.GetAxisName(ind))
+        config = self.poolmotor_proxy[ind - 1].get_attribute_config(
+            "Position")
+        for key, value in changes.items():
+            setattr(config, key, value)
+        self.poolmotor_proxy[ind - 1].set_attribute_config([config])
+        if "max_value" in changes:
+            self.propagated_max[ind - 1] = changes["max_value"]
+        if "min_value" in changes:
+            self.propagated_min[ind - 1] = changes["min_value"]
 
     def SetAxisPar(self, ind, name, value):
         if self.device_available[ind - 1]:
@@ -367,14 +474,15 @@ class HasyMotorCtrl(MotorController):
                             "decel", int(velocity / value))
                     return
                 try:
-                    velocity = float(self.proxy[ind - 1].read_attribute(
-                        self.attrName_Velocity[ind - 1]).value)
+                    velocity = float(self.param_cache.read(
+                        self.proxy[ind - 1], self.attrName_Velocity[ind - 1]))
                 except Exception:
                     velocity = 1.0
                 if value == 0.0:
                     value = 1.0
-                self.proxy[ind - 1].write_attribute(
-                    self.attrName_Acceleration[ind - 1], int(velocity / value))
+                self.param_cache.write(
+                    self.proxy[ind - 1], self.attrName_Acceleration[ind - 1],
+                    int(velocity / value))
             elif name == "base_rate":
                 if self.flag_standa[ind - 1] == 1:
                     return
@@ -387,19 +495,22 @@ class HasyMotorCtrl(MotorController):
                 if not self.conversion_included[ind - 1]:
                     try:
                         conversion = abs(
-                            float(self.proxy[ind - 1].read_attribute(
-                                "Conversion").value))
+                            float(self.param_cache.read(
+                                self.proxy[ind - 1], "Conversion")))
                     except Exception:
                         conversion = 1.0
-                    self.proxy[ind - 1].write_attribute(
-                        self.attrName_Velocity[ind - 1], (value * conversion))
+                    self.param_cache.write(
+                        self.proxy[ind - 1], self.attrName_Velocity[ind - 1],
+                        (value * conversion))
                 else:
-                    self.proxy[ind - 1].write_attribute(
-                        self.attrName_Velocity[ind - 1], value)
+                    self.param_cache.write(
+                        self.proxy[ind - 1], self.attrName_Velocity[ind - 1],
+                        value)
             elif name == "step_per_unit":
                 if self.flag_standa[ind - 1] == 1:
                     return
-                self.proxy[ind - 1].write_attribute("Conversion", value)
+                self.param_cache.write(
+                    self.proxy[ind - 1], "Conversion", value)
 
     def GetAxisPar(self, ind, name):
         value = float('nan')
@@ -423,11 +534,11 @@ class HasyMotorCtrl(MotorController):
                         value = 1.0
                     value = velocity / value
                     return value
-                value = float(self.proxy[ind - 1].read_attribute(
-                    self.attrName_Acceleration[ind - 1]).value)
+                value = float(self.param_cache.read(
+                    self.proxy[ind - 1], self.attrName_Acceleration[ind - 1]))
                 try:
-                    velocity = float(self.proxy[ind - 1].read_attribute(
-                        self.attrName_Velocity[ind - 1]).value)
+                    velocity = float(self.param_cache.read(
+                        self.proxy[ind - 1], self.attrName_Velocity[ind - 1]))
                 except Exception:
                     velocity = 1.0
                 if value == 0.0:
@@ -441,8 +552,8 @@ class HasyMotorCtrl(MotorController):
                         "BaseRate").value)
                     try:
                         conversion = abs(float(
-                            self.proxy[ind - 1].read_attribute(
-                                "Conversion").value))
+                            self.param_cache.read(
+                                self.proxy[ind - 1], "Conversion")))
                     except Exception:
                         conversion = 1.0
                     value /= conversion
@@ -453,13 +564,13 @@ class HasyMotorCtrl(MotorController):
                     value = float(self.proxy[ind - 1].read_attribute(
                         "speed").value)
                     return value
-                value = float(self.proxy[ind - 1].read_attribute(
-                    self.attrName_Velocity[ind - 1]).value)
+                value = float(self.param_cache.read(
+                    self.proxy[ind - 1], self.attrName_Velocity[ind - 1]))
                 if not self.conversion_included[ind - 1]:
                     try:
                         conversion = abs(
-                            float(self.proxy[ind - 1].read_attribute(
-                                "Conversion").value))
+                            float(self.param_cache.read(
+                                self.proxy[ind - 1], "Conversion")))
                     except Exception:
                         conversion = 1.0
                     value /= conversion
@@ -467,8 +578,8 @@ class HasyMotorCtrl(MotorController):
                 if self.flag_standa[ind - 1] == 1:
                     return 1.0
                 try:
-                    value = float(self.proxy[ind - 1].read_attribute(
-                        "Conversion").value)
+                    value = float(self.param_cache.read(
+                        self.proxy[ind - 1], "Conversion"))
                 except Exception:
                     value = 1.0
         return value
@@ -494,6 +605,7 @@ class HasyMotorCtrl(MotorController):
                 return
             position = float(position)
             self.proxy[ind - 1].Calibrate(position)
+            self.param_cache.invalidate(self.proxy[ind - 1])
 
     def setExtraParameterName(self, extra_parameter_name):
         self.extraparametername = extra_parameter_name
@@ -501,5 +613,18 @@ class HasyMotorCtrl(MotorController):
     def getExtraParameterName(self):
         return self.extraparametername
 
+    def setMaxConcurrentReads(self, max_concurrent_reads):
+        self.max_concurrent_reads = max(0, int(max_concurrent_reads))
+
+    def getMaxConcurrentReads(self):
+        return self.max_concurrent_reads
+
+    def getReadAllTiming(self):
+        mean = 0.
+        if self.read_all_calls:
+            mean = self.read_all_time / self.read_all_calls
+        return "calls %d mean %.6f s max %.6f s" % (
+            self.read_all_calls, mean, self.read_all_time_max)
+
     def __del__(self):
         pass
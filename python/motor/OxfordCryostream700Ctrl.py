@@ -1,12 +1,14 @@
 from PyTango import DevState
 from sardana.pool.controller import MotorController
 from sardana.pool import PoolUtil
+from sardana.PoolController import HasyTangoLib
 import time
 from threading import Timer
 
 TANGO_DEV = 'TangoDevice'
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class OxfordCryostream700Ctrl(MotorController):
     """This class is the Tango Sardana motor controller for the
        Tango OxfordCryostream700 device. Each 'axis' is represents,
@@ -2,6 +2,7 @@
 # import os
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana import DataAccess
 # from sardana import State, DataAccess
 from sardana.pool.controller import OneDController
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class HasyMCSCtrl(OneDController):
     "This class is the Tango Sardana One D controller for Hasylab"
 
@@ -37,29 +39,22 @@ class HasyMCSCtrl(OneDController):
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         OneDController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.flagIsMCS = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.flagIsMCS.append(False)
-            self.device_available.append(False)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
         self.dft_NbChannels = 0
         self.NbChannels = []
@@ -68,8 +63,20 @@ class HasyMCSCtrl(OneDController):
         self.dft_Preset = 0
         self.Preset = []
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.flagIsMCS.append(False)
+        self.device_available.append(False)
+        self.max_device = self.max_device + 1
+
     def AddDevice(self, ind):
         OneDController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             return
         proxy_name = self.tango_device[ind - 1]
@@ -78,7 +85,7 @@ class HasyMCSCtrl(OneDController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = True
         self.NbChannels.append(self.dft_NbChannels)
         self.NbAcquisitions.append(self.dft_NbAcquisitions)
@@ -86,6 +93,7 @@ class HasyMCSCtrl(OneDController):
 
     def DeleteDevice(self, ind):
         OneDController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
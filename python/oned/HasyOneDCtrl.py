@@ -2,6 +2,7 @@ import time
 # import time, os
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana import DataAccess
 # from sardana import State, DataAccess
 from sardana.pool.controller import OneDController
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class HasyOneDCtrl(OneDController):
     "This class is the Tango Sardana One D controller for Hasylab"
 
@@ -47,9 +49,7 @@ class HasyOneDCtrl(OneDController):
     def __init__(self, inst, props, *args, **kwargs):
         self.TangoHost = None
         OneDController.__init__(self, inst, props, *args, **kwargs)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             #
             # TangoHost can be hasgksspp07eh3:10000
             #
@@ -59,9 +59,8 @@ class HasyOneDCtrl(OneDController):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
@@ -85,37 +84,45 @@ class HasyOneDCtrl(OneDController):
         self.RoI4_start = []
         self.RoI4_end = []
         self.Counts_RoI4 = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.flagIsMCA8715.append(False)
-            self.flagIsHydraHarp400.append(False)
-            self.flagIsXIA.append(False)
-            self.flagIsSIS3302.append(False)
-            self.flagIsKromo.append(False)
-            self.flagIsAvantes.append(False)
-            self.flagIsCobold.append(False)
-            self.device_available.append(False)
-            self.RoI1_start.append(0)
-            self.RoI1_end.append(0)
-            self.Counts_RoI1.append(0)
-            self.RoI2_start.append(0)
-            self.RoI2_end.append(0)
-            self.Counts_RoI2.append(0)
-            self.RoI3_start.append(0)
-            self.RoI3_end.append(0)
-            self.Counts_RoI3.append(0)
-            self.RoI4_start.append(0)
-            self.RoI4_end.append(0)
-            self.Counts_RoI4.append(0)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
         self.acqTime = 0
         self.acqStartTime = None
         self.debugFlag = 0
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.flagIsMCA8715.append(False)
+        self.flagIsHydraHarp400.append(False)
+        self.flagIsXIA.append(False)
+        self.flagIsSIS3302.append(False)
+        self.flagIsKromo.append(False)
+        self.flagIsAvantes.append(False)
+        self.flagIsCobold.append(False)
+        self.device_available.append(False)
+        self.RoI1_start.append(0)
+        self.RoI1_end.append(0)
+        self.Counts_RoI1.append(0)
+        self.RoI2_start.append(0)
+        self.RoI2_end.append(0)
+        self.Counts_RoI2.append(0)
+        self.RoI3_start.append(0)
+        self.RoI3_end.append(0)
+        self.Counts_RoI3.append(0)
+        self.RoI4_start.append(0)
+        self.RoI4_end.append(0)
+        self.Counts_RoI4.append(0)
+        self.max_device = self.max_device + 1
+
     def AddDevice(self, ind):
         OneDController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             return
         proxy_name = self.tango_device[ind - 1]
@@ -124,7 +131,7 @@ class HasyOneDCtrl(OneDController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = True
         if hasattr(self.proxy[ind - 1], 'BankId'):
             self.flagIsMCA8715[ind - 1] = True
@@ -151,6 +158,7 @@ class HasyOneDCtrl(OneDController):
             print("HasyOneDCtrl.DeleteDevice % s index %d "
                   % (self.inst_name, ind))
         OneDController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
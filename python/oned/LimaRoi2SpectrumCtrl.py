@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana.pool.controller import OneDController
 # import time, os
 
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class LimaRoi2SpectrumCtrl(OneDController):
     "This class is the One D controller for the Roi2Spectrum Lima device"
 
@@ -2,6 +2,7 @@ import time
 # import os
 
 import PyTango
+from sardana.PoolController import HasyTangoLib
 from sardana import State, DataAccess
 from sardana.pool.controller import OneDController
 from sardana.pool.controller import Type, Access, Description
@@ -12,6 +13,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument(round_trips=False)
 class SIS3302Ctrl(OneDController):
     "This class is the Tango Sardana One D controller for Hasylab"
 
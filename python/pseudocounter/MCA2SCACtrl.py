@@ -3,6 +3,7 @@
 # from sardana import pool
 # from sardana.pool import PoolUtil
 from sardana.pool.controller import PseudoCounterController
+from sardana.PoolController import HasyTangoLib
 
 # from math import *
 
@@ -16,6 +17,7 @@ from sardana.pool.controller import PseudoCounterController
 # Will disapear when we have pseudo counters
 # that can have other pseudo counters
 # in their counter roles.
+@HasyTangoLib.instrument(round_trips=False)
 class MCA2SCACtrl(PseudoCounterController):
     """ A counter controller which receives an MCA Spectrum
         and return a single value"""
@@ -45,18 +47,39 @@ class MCA2SCACtrl(PseudoCounterController):
         PseudoCounterController.__init__(self, inst, props, *args, **kwargs)
 
         self.counterExtraAttributes = {}
-        self.counterExtraAttributes[1] = {"RoI1": 0,
-                                          "RoI2": 0}
+        # the RoIs of all axes, computed once per spectrum
+        self.spectrum = None
+        self.sca_values = {}
+
+    def _get_rois(self, index):
+        if index not in self.counterExtraAttributes:
+            self.counterExtraAttributes[index] = {"RoI1": 0,
+                                                  "RoI2": 0}
+        return self.counterExtraAttributes[index]
 
     def GetAxisExtraPar(self, index, name):
-        return self.counterExtraAttributes[1][name]
+        return self._get_rois(index)[name]
 
     def SetAxisExtraPar(self, counter, name, value):
-        self.counterExtraAttributes[1][name] = value
+        self._get_rois(counter)[name] = value
+        self.spectrum = None
 
     def Calc(self, index, counter_values):
-        sum = 0
-        for i in range(self.counterExtraAttributes[1]['RoI1'],
-                       self.counterExtraAttributes[1]['RoI2']):
-            sum = sum + counter_values[0][i]
-        return float(sum)
+        self._get_rois(index)
+        spectrum = counter_values[0]
+        if spectrum is not self.spectrum or index not in self.sca_values:
+            axes = sorted(self.counterExtraAttributes)
+            values = HasyTangoLib.roi_sums(
+                spectrum,
+                [self.counterExtraAttributes[axis]['RoI1'] for axis in axes],
+                [self.counterExtraAttributes[axis]['RoI2'] for axis in axes])
+            self.sca_values = dict(zip(axes, values.tolist()))
+            self.spectrum = spectrum
+        return float(self.sca_values[index])
+
+
+class MCA2SCAsCtrl(MCA2SCACtrl):
+    """ A counter controller which receives an MCA Spectrum
+        and returns the values of up to 8 RoIs"""
+
+    pseudo_counter_roles = tuple('sca%d' % i for i in range(1, 9))
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 '''
 
 this controller should be able to handle 'ct' and 'ascan', 'dscan', etc.
@@ -26,7 +27,7 @@ because we don't know how many stops a scan will have.
 from sardana import DataAccess
 from sardana.pool.controller import TwoDController
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
 import time
@@ -39,6 +40,7 @@ ReadWrite = DataAccess.ReadWrite
 TIME_SLEEP = 0.01
 
 
+@HasyTangoLib.instrument
 class EigerDectrisCtrl(TwoDController):
     "This class is the Tango Sardana Two D controller for the EigerDectris"
 
@@ -57,6 +59,11 @@ class EigerDectrisCtrl(TwoDController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     MaxDevice = 97
@@ -65,18 +72,15 @@ class EigerDectrisCtrl(TwoDController):
         self.TangoHost = None
         TwoDController.__init__(self, inst, props, *args, **kwargs)
 
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.tango_device_fw = []  # file writer
@@ -84,21 +88,8 @@ class EigerDectrisCtrl(TwoDController):
         self.proxy_fw = []
         self.device_available = []
         self.APIVersion = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.tango_device_fw.append(self.getFwName(name))
-
-            self.proxy.append(None)
-            self.proxy_fw.append(None)
-            self.device_available.append(0)
-            self.max_device = self.max_device + 1
-            if len(self.APIVersion) == 0:
-                #
-                # temp '1.8.0'
-                #
-                temp = getDeviceProperty(
-                    name, 'APIVersion', tangoHost=self.TangoHost)[0]
-                self.APIVersion = [ll for ll in temp.split('.')]
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
         self.dft_CountTime = 0
         self.CountTime = []
@@ -115,19 +106,42 @@ class EigerDectrisCtrl(TwoDController):
         '''
         get the filewriter name belonging to name, e.g.: p62/eiger/e4m
         so we look at the list of filewriters and check theis EigerDevice
-        property to find the filewriter in charge of name
+        property to find the filewriter in charge of name. The database
+        answers are cached, they are queried again if none matches
         '''
-        devsFw = getDeviceNamesByClass(
-            "EigerFilewriter", tangoHost=self.TangoHost)
-        for devFw in devsFw:
-            prop = getDeviceProperty(
-                devFw, 'EigerDevice', tangoHost=self.TangoHost)
-            if prop[0] == name:
-                return devFw
+        for refresh in (False, True):
+            devsFw = HasyTangoLib.get_device_names_by_class(
+                "EigerFilewriter", self.TangoHost, refresh)
+            for devFw in devsFw:
+                prop = HasyTangoLib.get_device_property(
+                    devFw, 'EigerDevice', self.TangoHost, refresh)
+                if prop and prop[0] == name:
+                    return devFw
         return None
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.tango_device_fw.append(self.getFwName(name))
+
+        self.proxy.append(None)
+        self.proxy_fw.append(None)
+        self.device_available.append(0)
+        self.max_device = self.max_device + 1
+        if len(self.APIVersion) == 0:
+            #
+            # temp '1.8.0'
+            #
+            temp = HasyTangoLib.get_device_property(
+                name, 'APIVersion', self.TangoHost)[0]
+            self.APIVersion = [ll for ll in temp.split('.')]
+
     def AddDevice(self, ind):
         TwoDController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("EigerDectris.AddDevice: ind %d > max_device %d" %
                   (ind, self.max_device))
@@ -142,8 +156,8 @@ class EigerDectrisCtrl(TwoDController):
                 str(self.tango_device[ind - 1])
             proxy_name_fw = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device_fw[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
-        self.proxy_fw[ind - 1] = PyTango.DeviceProxy(proxy_name_fw)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
+        self.proxy_fw[ind - 1] = HasyTangoLib.get_proxy(proxy_name_fw)
         self.device_available[ind - 1] = 1
         self.CountTime.append(self.dft_CountTime)
         self.CountTimeInte.append(self.dft_CountTimeInte)
@@ -155,13 +169,16 @@ class EigerDectrisCtrl(TwoDController):
             print("EigerDectris.deleteDevice %s" %
                   self.tango_device[ind - 1])
         TwoDController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
+        HasyTangoLib.release_proxy(self.proxy_fw[ind - 1])
         self.proxy_fw[ind - 1] = None
         self.device_available[ind - 1] = 0
 
     def StateOne(self, ind):
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             if sta == PyTango.DevState.ON:
                 tup = (sta, "Camera ready")
             elif sta == PyTango.DevState.MOVING:
@@ -233,6 +250,7 @@ class EigerDectrisCtrl(TwoDController):
         return True
 
     def StartOne(self, ind, position=None):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         if self.isatty:
             print("EigerDectris.StartOne, %s, state %s" %
                   (self.tango_device[ind - 1],
@@ -1,11 +1,12 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 import time
 # import os
 
 # from sardana import State
 from sardana import DataAccess
 from sardana.pool.controller import TwoDController
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool.controller import DefaultValue
 # from sardana.pool import PoolUtil
 
@@ -13,6 +14,7 @@ ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class TangoVimbaCtrl(TwoDController):
     "This class is the Tango Sardana Two D controller for the TangoVimba"
 
@@ -33,6 +35,11 @@ class TangoVimbaCtrl(TwoDController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     MaxDevice = 97
@@ -41,18 +48,15 @@ class TangoVimbaCtrl(TwoDController):
         self.TangoHost = None
         TwoDController.__init__(self, inst, props, *args, **kwargs)
         print("PYTHON -> TwoDController ctor for instance", inst)
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             self.node = self.TangoHost
             self.port = 10000
             if self.TangoHost.find(':'):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
@@ -60,19 +64,27 @@ class TangoVimbaCtrl(TwoDController):
         self.start_time = []
         self.acq_type = []
         self.exp_time = 0
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.start_time.append(time.time())
-            self.acq_type.append(0)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.start_time.append(time.time())
+        self.acq_type.append(0)
+        self.max_device = self.max_device + 1
+
     def AddDevice(self, ind):
         # print "PYTHON -> TangoVimbaCtrl/", self.inst_name,": \
         #        In AddDevice method for index", ind
         TwoDController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -82,13 +94,14 @@ class TangoVimbaCtrl(TwoDController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         #        print "PYTHON -> TangoVimbaCtrl/", self.inst_name, \
         # ": In DeleteDevice method for index", ind
         TwoDController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
@@ -105,7 +118,8 @@ class TangoVimbaCtrl(TwoDController):
                     pass
             sta = PyTango.DevState.ON
             tup = (sta, "Camera ready")
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             if sta == PyTango.DevState.ON:
                 tup = (sta, "Camera ready")
             elif (sta == PyTango.DevState.RUNNING or
@@ -151,6 +165,7 @@ class TangoVimbaCtrl(TwoDController):
         pass
 
     def StartOne(self, ind, position=None):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         #        print "PYTHON -> TangoVimbaCtrl/", self.inst_name, \
         # ": In StartOne method for index", ind
         self.proxy[ind - 1].FileSaving = True
@@ -1,4 +1,5 @@
 import PyTango
+from sardana.PoolController import HasyTangoLib
 
 # import time, os
 
@@ -6,13 +7,14 @@ from sardana import DataAccess
 # from sardana import State, DataAccess
 from sardana.pool.controller import ZeroDController
 # from sardana.pool.controller import Type, Access, Description, DefaultValue
-from sardana.pool.controller import Type, Access, Description
+from sardana.pool.controller import Type, Access, Description, DefaultValue
 # from sardana.pool import PoolUtil
 
 ReadOnly = DataAccess.ReadOnly
 ReadWrite = DataAccess.ReadWrite
 
 
+@HasyTangoLib.instrument
 class HasyADCCtrl(ZeroDController):
     "This class is the Tango Sardana Zero D controller " \
         + "for a generic Hasylab ADC"
@@ -29,6 +31,11 @@ class HasyADCCtrl(ZeroDController):
         'TangoHost': {
             Type: str,
             Description: 'The tango host where searching the devices'},
+        'StateEvents': {
+            Type: bool,
+            Description: 'Take the State from change events, polled '
+            'if the device sends none',
+            DefaultValue: False},
     }
 
     MaxDevice = 97
@@ -37,9 +44,7 @@ class HasyADCCtrl(ZeroDController):
         self.TangoHost = None
         ZeroDController.__init__(self, inst, props, *args, **kwargs)
 #        print "PYTHON -> ZeroDController ctor for instance", inst
-        if self.TangoHost is None:
-            self.db = PyTango.Database()
-        else:
+        if self.TangoHost is not None:
             #
             # TangoHost can be hasgksspp07eh3:10000
             #
@@ -49,26 +54,33 @@ class HasyADCCtrl(ZeroDController):
                 lst = self.TangoHost.split(':')
                 self.node = lst[0]
                 self.port = int(lst[1])
-            self.db = PyTango.Database(self.node, self.port)
-        name_dev_ask = self.RootDeviceName + "*"
-        self.devices = self.db.get_device_exported(name_dev_ask)
+        self.devices = HasyTangoLib.get_device_exported(
+            self.RootDeviceName, self.TangoHost)
         self.max_device = 0
         self.tango_device = []
         self.proxy = []
         self.conversion = []
         self.device_available = []
-        for name in self.devices.value_string:
-            self.tango_device.append(name)
-            self.proxy.append(None)
-            self.device_available.append(0)
-            self.conversion.append(1.)
-            self.max_device = self.max_device + 1
+        for name in self.devices:
+            self._append_device(name)
         self.started = False
 
+    def _append_device(self, name):
+        self.tango_device.append(name)
+        self.proxy.append(None)
+        self.device_available.append(0)
+        self.conversion.append(1.)
+        self.max_device = self.max_device + 1
+
     def AddDevice(self, ind):
         #        print "PYTHON -> HasyADCCtrl/", self.inst_name,": \
         # In AddDevice method for index", ind
         ZeroDController.AddDevice(self, ind)
+        if ind > self.max_device:
+            # exported after the controller was created
+            for name in HasyTangoLib.refresh_device_exported(
+                    self.RootDeviceName, self.TangoHost, self.tango_device):
+                self._append_device(name)
         if ind > self.max_device:
             print("False index")
             return
@@ -78,13 +90,14 @@ class HasyADCCtrl(ZeroDController):
         else:
             proxy_name = str(self.node) + (":%s/" % self.port) + \
                 str(self.tango_device[ind - 1])
-        self.proxy[ind - 1] = PyTango.DeviceProxy(proxy_name)
+        self.proxy[ind - 1] = HasyTangoLib.get_proxy(proxy_name)
         self.device_available[ind - 1] = 1
 
     def DeleteDevice(self, ind):
         #        print "PYTHON -> HasyADCCtrl/", self.inst_name,": \
         # In DeleteDevice method for index", ind
         ZeroDController.DeleteDevice(self, ind)
+        HasyTangoLib.release_proxy(self.proxy[ind - 1])
         self.proxy[ind - 1] = None
         self.device_available[ind - 1] = 0
 
@@ -92,7 +105,8 @@ class HasyADCCtrl(ZeroDController):
         #        print "PYTHON -> HasyADCCtrl/", self.inst_name,": \
         # In StateOne method for index", ind
         if self.device_available[ind - 1] == 1:
-            sta = self.proxy[ind - 1].command_inout("State")
+            sta = HasyTangoLib.read_state(
+                self.proxy[ind - 1], self.StateEvents)
             if sta == PyTango.DevState.ON:
                 tup = (sta, "ADC is in ON State")
             elif sta == PyTango.DevState.MOVING:
@@ -132,6 +146,7 @@ class HasyADCCtrl(ZeroDController):
         pass
 
     def StartOne(self, ind, value):
+        HasyTangoLib.invalidate_state(self.proxy[ind - 1])
         # print "PYTHON -> HasyADCCtrl/", self.inst_name,": \
         #     In StartOne method for index", ind
         self.wanted.append(ind)
@@ -0,0 +1,1077 @@
+#!/usr/bin/env python
+#
+# Test harness of the controllers
+#
+# The tests import the controllers from the source tree as the package
+# sardana.PoolController, HasyTangoLib is the same module imported as
+# HasyTangoLib. PyTango, sardana and taurus are used if installed, else
+# stub modules provide the names the controllers use.
+#
+# The controllers talk to a fake Tango system, FakeTango, through
+# FakeDatabase and FakeDeviceProxy which replace PyTango.Database and
+# PyTango.DeviceProxy in the tests using the tango fixture. Each call to
+# a device or the database costs the configurable latency and is
+# counted. The devices are instances of FakeDevice subclasses with the
+# attributes and commands of the Tango classes, e.g. SIS3820, DGG2,
+# MCA_8701, LimaCCD, EigerDectris.
+#
+# FakePool calls the controller methods in the order of the Sardana pool
+# for the points of a scan, the pool fixture creates controllers with
+# their axes and deletes them after the test.
+#
+# The benchmarks are the tests marked benchmark, they run only with the
+# option --benchmark.
+#
+import copy
+import fnmatch
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy
+import pytest
+
+PYTHON_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python")
+sys.path.insert(0, PYTHON_DIR)
+
+TANGO_HOST = "haso:10000"
+
+STATE_NAMES = (
+    "ON", "OFF", "CLOSE", "OPEN", "INSERT", "EXTRACT", "MOVING", "STANDBY",
+    "FAULT", "INIT", "RUNNING", "ALARM", "DISABLE", "UNKNOWN")
+
+
+#
+# Stub modules of the packages which are not installed
+#
+def _stub_pytango():
+    module = types.ModuleType("PyTango")
+
+    class EventType(object):
+        CHANGE_EVENT = 0
+
+    class DevState(object):
+        pass
+
+    for name in STATE_NAMES:
+        setattr(DevState, name, name)
+
+    class DevFailed(Exception):
+        pass
+
+    class Except(object):
+        @staticmethod
+        def throw_exception(reason, desc, origin):
+            raise DevFailed(reason, desc, origin)
+
+    def DeviceProxy(name):
+        raise DevFailed("PyTango stub: no device %s" % name)
+
+    def Database(*args):
+        raise DevFailed("PyTango stub: no database")
+
+    module.EventType = EventType
+    module.DevState = DevState
+    module.DevFailed = DevFailed
+    module.Except = Except
+    module.DeviceProxy = DeviceProxy
+    module.Database = Database
+    for name in ("DevBoolean", "DevLong", "DevFloat", "DevDouble",
+                 "DevString", "READ_WRITE"):
+        setattr(module, name, name)
+    return module
+
+
+def _stub_sardana():
+    package = types.ModuleType("sardana")
+    pool = types.ModuleType("sardana.pool")
+    controller = types.ModuleType("sardana.pool.controller")
+
+    class State(object):
+        pass
+
+    for name in STATE_NAMES:
+        setattr(State, name.capitalize(), getattr(PyTango.DevState, name))
+
+    class DataAccess(object):
+        ReadOnly = "ReadOnly"
+        ReadWrite = "ReadWrite"
+
+    class PoolUtil(object):
+        def get_device(self, ctrl_name, device_name):
+            return PyTango.DeviceProxy(device_name)
+
+    names = {
+        "Type": "type", "Access": "r/w type", "Description": "description",
+        "DefaultValue": "defaultvalue", "FGet": "fget", "FSet": "fset",
+        "Memorize": "memorize", "Memorized": "true",
+        "NotMemorized": "false", "MaxDimSize": "maxdimsize"}
+    for name, value in names.items():
+        setattr(controller, name, value)
+
+    class Controller(object):
+        """The base class of the controllers, sets the properties"""
+        ctrl_properties = {}
+        axis_attributes = {}
+        ctrl_attributes = {}
+
+        def __init__(self, inst, props, *args, **kwargs):
+            self.inst_name = inst
+            self._log = logging.getLogger("Controller.%s" % inst)
+            for name, info in self.ctrl_properties.items():
+                if name in props:
+                    value = props[name]
+                elif names["DefaultValue"] in info:
+                    value = info[names["DefaultValue"]]
+                else:
+                    raise ValueError(
+                        "%s: property %s has no value" % (inst, name))
+                setattr(self, name, value)
+
+        def GetAxisName(self, axis):
+            return "%s_%d" % (self.inst_name, axis)
+
+        def GetAxisAttributes(self, axis):
+            attrs = {"Value": {names["Type"]: float,
+                               names["Access"]: DataAccess.ReadOnly}}
+            attrs.update(copy.deepcopy(self.axis_attributes))
+            return attrs
+
+        def AddDevice(self, axis):
+            pass
+
+        def DeleteDevice(self, axis):
+            pass
+
+        def PreStateAll(self):
+            pass
+
+        def PreStateOne(self, axis):
+            pass
+
+        def StateAll(self):
+            pass
+
+        def PreReadAll(self):
+            pass
+
+        def PreReadOne(self, axis):
+            pass
+
+        def ReadAll(self):
+            pass
+
+        def PreStartAll(self):
+            pass
+
+        def PreStartOne(self, axis, value):
+            return True
+
+        def StartAll(self):
+            pass
+
+        def SendToCtrl(self, stream):
+            return ""
+
+    controller.Controller = Controller
+    for name in ("CounterTimerController", "ZeroDController",
+                 "OneDController", "TwoDController", "MotorController",
+                 "PseudoCounterController", "IORegisterController"):
+        setattr(controller, name, type(name, (Controller,), {}))
+
+    package.State = State
+    package.DataAccess = DataAccess
+    package.pool = pool
+    pool.PoolUtil = PoolUtil
+    pool.controller = controller
+    sys.modules["sardana"] = package
+    sys.modules["sardana.pool"] = pool
+    sys.modules["sardana.pool.controller"] = controller
+
+
+def _stub_taurus():
+    module = types.ModuleType("taurus")
+
+    def Device(name):
+        return PyTango.DeviceProxy(name)
+
+    module.Device = Device
+    sys.modules["taurus"] = module
+
+
+try:
+    import PyTango
+except ImportError:
+    PyTango = _stub_pytango()
+    sys.modules["PyTango"] = PyTango
+
+try:
+    import sardana.pool.controller  # noqa: F401
+except ImportError:
+    _stub_sardana()
+
+try:
+    import taurus  # noqa: F401
+except ImportError:
+    _stub_taurus()
+
+# the controllers of the source tree, not an installed version
+_package = types.ModuleType("sardana.PoolController")
+_package.__path__ = [PYTHON_DIR]
+sys.modules["sardana.PoolController"] = _package
+sys.modules["sardana"].PoolController = _package
+
+from sardana.PoolController import HasyTangoLib  # noqa: E402
+
+sys.modules["HasyTangoLib"] = HasyTangoLib
+
+
+#
+# Fake Tango system
+#
+def _short_name(name):
+    """'tango://haso:10000/p09/dgg2/eh.01' -> 'p09/dgg2/eh.01'"""
+    name = name.strip().lower()
+    if name.startswith("tango://"):
+        name = name[len("tango://"):]
+    if name.count('/') > 2:
+        name = name.split('/', 1)[1]
+    return name
+
+
+class DeviceAttribute(object):
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+        self.w_value = value
+        self.has_failed = False
+
+
+class CommandInfo(object):
+    def __init__(self, cmd_name):
+        self.cmd_name = cmd_name
+
+
+class DbDatum(object):
+    def __init__(self, value_string):
+        self.value_string = list(value_string)
+
+
+class FakeDevice(object):
+    """A device of the fake Tango system
+
+    attributes are the attributes of the Tango class with their initial
+    values, the values passed to the constructor change them or add
+    attributes. commands are the commands of the class. A start command
+    makes the device busy_state for exposure() s, a stop command ends
+    that. executed lists the commands received. A subclass computes an
+    attribute in read_<attr>(), handles a write in write_<attr>(value)
+    and a command in cmd_<command>(argin).
+    """
+    dev_class = "FakeDevice"
+    attributes = {}
+    commands = ()
+    start_commands = ()
+    stop_commands = ()
+    busy_state = "MOVING"
+
+    def __init__(self, tango, name, server=None, properties=None,
+                 **values):
+        self.tango = tango
+        self.name = name
+        if server is None:
+            server = "%s/test" % self.dev_class
+        self.server = server
+        self.properties = dict(
+            (key, [str(v) for v in value])
+            for key, value in (properties or {}).items())
+        self.values = copy.deepcopy(self.attributes)
+        self._attr_names = dict(
+            (attr.lower(), attr) for attr in
+            list(self.values) + ["State", "Status"])
+        self._cmd_names = dict(
+            (cmd.lower(), cmd) for cmd in
+            list(self.commands) + ["State", "Status", "Init"])
+        for attr, value in values.items():
+            # a device may have attributes its class lacks
+            attr = self._attr_names.setdefault(attr.lower(), attr)
+            self.values[attr] = value
+        self.executed = []
+        self.fault = False
+        self.start_time = 0.
+        self.busy_until = 0.
+
+    def attr_name(self, name):
+        try:
+            return self._attr_names[name.lower()]
+        except KeyError:
+            raise PyTango.DevFailed(
+                "%s: no attribute %s" % (self.name, name))
+
+    def cmd_name(self, name):
+        try:
+            return self._cmd_names[name.lower()]
+        except KeyError:
+            raise PyTango.DevFailed(
+                "%s: no command %s" % (self.name, name))
+
+    def has_attribute(self, name):
+        return name.lower() in self._attr_names
+
+    def has_command(self, name):
+        return name.lower() in self._cmd_names
+
+    def busy(self):
+        return time.time() < self.busy_until
+
+    def state(self):
+        if self.fault:
+            return PyTango.DevState.FAULT
+        if self.busy():
+            return getattr(PyTango.DevState, self.busy_state)
+        return PyTango.DevState.ON
+
+    def status(self):
+        return "The device is in %s state." % self.state()
+
+    def exposure(self):
+        return 0.
+
+    def start(self):
+        self.start_time = time.time()
+        self.busy_until = self.start_time + self.exposure()
+
+    def stop(self):
+        self.busy_until = 0.
+
+    def read(self, name):
+        name = self.attr_name(name)
+        if name == "State":
+            return self.state()
+        if name == "Status":
+            return self.status()
+        method = getattr(self, "read_" + name, None)
+        if method is not None:
+            return method()
+        return self.values[name]
+
+    def write(self, name, value):
+        name = self.attr_name(name)
+        method = getattr(self, "write_" + name, None)
+        if method is not None:
+            method(value)
+        else:
+            self.values[name] = value
+
+    def command(self, name, argin=None):
+        name = self.cmd_name(name)
+        self.executed.append(name)
+        if name == "State":
+            return self.state()
+        if name == "Status":
+            return self.status()
+        method = getattr(self, "cmd_" + name, None)
+        if method is not None:
+            return method(argin)
+        if name in self.start_commands:
+            self.start()
+        elif name in self.stop_commands:
+            self.stop()
+
+
+class SIS3820(FakeDevice):
+    """A channel of the SIS3820 scaler, counting while the gate of the
+    timer is open, the fake counts do not change"""
+    dev_class = "SIS3820"
+    attributes = {"Counts": 0, "Offset": 0.}
+    commands = ("Reset",)
+
+
+class SIS3820MCS(FakeDevice):
+    """The multi channel scaler mode of a SIS3820 module, acquires
+    NbAcquisitions triggers, one every trigger_period s, after SetupMCS"""
+    dev_class = "SIS3820MCS"
+    attributes = {"NbAcquisitions": 1, "NbChannels": 32, "Preset": 0,
+                  "AcquiredTriggers": 0, "CountsArray": None}
+    commands = ("SetupMCS", "ReadMCS")
+    start_commands = ("SetupMCS",)
+    trigger_period = 0.01
+
+    def exposure(self):
+        return self.values["NbAcquisitions"] * self.trigger_period
+
+    def read_AcquiredTriggers(self):
+        if not self.start_time:
+            return 0
+        return min(self.values["NbAcquisitions"], int(
+            (time.time() - self.start_time) / self.trigger_period))
+
+    def cmd_ReadMCS(self, argin):
+        # row i channel c counted 100 * (i + 1) + c
+        rows = numpy.arange(1, self.values["NbAcquisitions"] + 1)
+        channels = numpy.arange(self.values["NbChannels"])
+        self.values["CountsArray"] = \
+            100 * rows[:, numpy.newaxis] + channels[numpy.newaxis, :]
+
+
+class DGG2(FakeDevice):
+    """The DGG2 timer, its gate is open for SampleTime s after Start"""
+    dev_class = "DGG2"
+    attributes = {"SampleTime": 1., "RemainingTime": 0.}
+    commands = ("Start", "StartPreset", "Stop")
+    start_commands = ("Start", "StartPreset")
+    stop_commands = ("Stop",)
+
+    def exposure(self):
+        return self.values["SampleTime"]
+
+    def read_RemainingTime(self):
+        return max(0., self.busy_until - time.time())
+
+
+class VFCADC(FakeDevice):
+    dev_class = "VFCADC"
+    attributes = {"Counts": 0, "Value": 0., "Offset": 0., "Gain": 1.,
+                  "Polarity": 1}
+    commands = ("Reset", "SetOffset", "SetGain", "SetPolarity")
+
+
+class MCA8701(FakeDevice):
+    """A MCA, acquires between Start and Stop, its State stays ON"""
+    dev_class = "MCA_8701"
+    attributes = {"Data": numpy.arange(8192, dtype=numpy.int32) % 100,
+                  "DataLength": 8192}
+    commands = ("Clear", "Start", "Stop", "Read")
+
+    def write_DataLength(self, value):
+        self.values["DataLength"] = value
+        self.values["Data"] = numpy.arange(value, dtype=numpy.int32) % 100
+
+
+class LimaCCD(FakeDevice):
+    """A Lima camera, its acq_status is Running for acq_nb_frames
+    images of acq_expo_time s after startAcq"""
+    dev_class = "LimaCCD"
+    attributes = {
+        "acq_status": "Ready", "acq_expo_time": 1., "acq_nb_frames": 1,
+        "acq_trigger_mode": "INTERNAL_TRIGGER", "latency_time": 0.,
+        "last_image_ready": -1, "saving_prefix": "", "saving_suffix": "",
+        "saving_directory": "", "saving_mode": "MANUAL",
+        "saving_common_header": [], "saving_header_delimiter": [],
+        "saving_next_number": 0, "camera_type": "Simulator",
+        "image_width": 1024, "image_height": 1024}
+    commands = ("prepareAcq", "startAcq", "stopAcq", "Reset")
+    start_commands = ("startAcq",)
+    stop_commands = ("stopAcq",)
+
+    def exposure(self):
+        return self.values["acq_expo_time"] * self.values["acq_nb_frames"]
+
+    def state(self):
+        return PyTango.DevState.FAULT if self.fault else PyTango.DevState.ON
+
+    def read_acq_status(self):
+        if self.fault:
+            return "Fault"
+        return "Running" if self.busy() else "Ready"
+
+    def read_last_image_ready(self):
+        if not self.start_time:
+            return -1
+        if self.busy():
+            return int((time.time() - self.start_time) /
+                       self.values["acq_expo_time"]) - 1
+        return self.values["acq_nb_frames"] - 1
+
+
+class EigerDectris(FakeDevice):
+    """An Eiger detector, Arm makes its status 'ready' and the filewriter
+    with the device in its EigerDevice property MOVING, Trigger makes it
+    MOVING for CountTime s, Disarm ends the series"""
+    dev_class = "EigerDectris"
+    attributes = {"CountTime": 1., "CountTimeInte": 1., "NbTriggers": 1,
+                  "TriggerMode": "ints"}
+    commands = ("Arm", "Disarm", "Trigger", "Abort")
+    start_commands = ("Trigger",)
+    stop_commands = ("Abort",)
+    armed = False
+
+    def exposure(self):
+        return self.values["CountTime"]
+
+    def status(self):
+        return "ready" if self.armed else "idle"
+
+    def _filewriters(self):
+        return [dev for dev in self.tango.devices.values()
+                if isinstance(dev, EigerFilewriter) and
+                dev.properties.get("EigerDevice") == [self.name]]
+
+    def cmd_Arm(self, argin):
+        self.armed = True
+        for fw in self._filewriters():
+            fw.busy_until = float("inf")
+
+    def cmd_Disarm(self, argin):
+        self.armed = False
+        self.stop()
+        for fw in self._filewriters():
+            fw.stop()
+
+
+class EigerFilewriter(FakeDevice):
+    dev_class = "EigerFilewriter"
+    attributes = {"Mode": "enabled", "NamePattern": "series_$id"}
+
+    def status(self):
+        return "acquire" if self.busy() else "ready"
+
+
+class Lambda(FakeDevice):
+    """A Lambda detector, RUNNING for ShutterTime ms after StartAcq"""
+    dev_class = "LambdaDetector"
+    attributes = {"ShutterTime": 1000., "FrameNumbers": 1,
+                  "DelayTime": 0., "ThresholdEnergy": 6.,
+                  "SaveFilePath": "/tmp", "SaveFileName": "lambda",
+                  "LatestImageNumber": 0}
+    commands = ("StartAcq", "StopAcq")
+    start_commands = ("StartAcq",)
+    stop_commands = ("StopAcq",)
+    busy_state = "RUNNING"
+
+    def exposure(self):
+        return self.values["ShutterTime"] / 1000. * \
+            self.values["FrameNumbers"]
+
+
+class OmsVme58(FakeDevice):
+    """A motor, moves to a written Position with SlewRate / Conversion
+    units per s"""
+    dev_class = "OmsVme58"
+    attributes = {
+        "Position": 0., "UnitLimitMax": 100., "UnitLimitMin": -100.,
+        "CwLimit": 0, "CcwLimit": 0, "Conversion": 1000.,
+        "SlewRate": 100000, "Acceleration": 100, "BaseRate": 0,
+        "PositionSim": 0., "ResultSim": ""}
+    commands = ("StopMove", "Calibrate")
+    stop_commands = ("StopMove",)
+    origin = 0.
+
+    def read_Position(self):
+        target = self.values["Position"]
+        if not self.busy():
+            return target
+        moved = (time.time() - self.start_time) / \
+            (self.busy_until - self.start_time)
+        return self.origin + moved * (target - self.origin)
+
+    def write_Position(self, value):
+        self.origin = self.read_Position()
+        self.values["Position"] = value
+        self.start()
+
+    def exposure(self):
+        speed = abs(self.values["SlewRate"] / self.values["Conversion"])
+        return abs(self.values["Position"] - self.origin) / speed
+
+    def cmd_StopMove(self, argin):
+        self.values["Position"] = self.read_Position()
+        self.stop()
+
+    def cmd_Calibrate(self, argin):
+        self.values["Position"] = float(argin)
+
+
+class ADC(FakeDevice):
+    dev_class = "ADC"
+    attributes = {"Value": 0.}
+
+
+class SIS3610(FakeDevice):
+    dev_class = "SIS3610In"
+    attributes = {"Value": 0}
+
+
+DEVICE_CLASSES = dict(
+    (cls.dev_class, cls) for cls in (
+        SIS3820, SIS3820MCS, DGG2, VFCADC, MCA8701, LimaCCD, EigerDectris,
+        EigerFilewriter, Lambda, OmsVme58, ADC, SIS3610))
+
+
+class FakeTango(object):
+    """The devices and database of a fake Tango system
+
+    latency is the duration (s) of a device call, db_latency of a
+    database call. round_trips, db_calls and proxies count the device
+    calls, database calls and DeviceProxy objects created.
+    """
+
+    def __init__(self, latency=0., db_latency=0.):
+        self.latency = latency
+        self.db_latency = db_latency
+        # short device name -> FakeDevice, in the export order
+        self.devices = {}
+        self._lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.db_calls = 0
+        self.proxies = 0
+
+    def add(self, dev_class, *names, **kwargs):
+        """Export devices of a class, return the last one"""
+        device = None
+        for name in names:
+            device = DEVICE_CLASSES[dev_class](self, name, **kwargs)
+            self.devices[_short_name(name)] = device
+        return device
+
+    def get(self, name):
+        try:
+            return self.devices[_short_name(name)]
+        except KeyError:
+            raise PyTango.DevFailed("device %s not defined" % name)
+
+    def round_trip(self, wait=True):
+        with self._lock:
+            self.round_trips += 1
+        if wait and self.latency > 0:
+            time.sleep(self.latency)
+
+    def db_call(self):
+        with self._lock:
+            self.db_calls += 1
+        if self.db_latency > 0:
+            time.sleep(self.db_latency)
+
+    def Database(self, *args):
+        return FakeDatabase(self)
+
+    def DeviceProxy(self, name):
+        return FakeDeviceProxy(self, name)
+
+
+class FakeDatabase(object):
+    def __init__(self, tango):
+        self._tango = tango
+
+    def _devices(self):
+        return list(self._tango.devices.values())
+
+    def get_device_exported(self, pattern):
+        self._tango.db_call()
+        pattern = pattern.lower()
+        return DbDatum([dev.name for dev in self._devices()
+                        if fnmatch.fnmatchcase(dev.name.lower(), pattern)])
+
+    def get_device_name(self, server, dev_class):
+        self._tango.db_call()
+        return DbDatum([dev.name for dev in self._devices()
+                        if fnmatch.fnmatchcase(dev.server, server) and
+                        dev.dev_class == dev_class])
+
+    def get_device_property(self, device_name, names):
+        self._tango.db_call()
+        device = self._tango.get(device_name)
+        return dict((name, list(device.properties.get(name, [])))
+                    for name in names)
+
+    def get_server_list(self, pattern="*"):
+        self._tango.db_call()
+        servers = []
+        for dev in self._devices():
+            if dev.server not in servers and \
+               fnmatch.fnmatchcase(dev.server, pattern):
+                servers.append(dev.server)
+        return DbDatum(servers)
+
+    def get_server_class_list(self, server):
+        self._tango.db_call()
+        classes = []
+        for dev in self._devices():
+            if dev.server == server and dev.dev_class not in classes:
+                classes.append(dev.dev_class)
+        return DbDatum(classes)
+
+    def get_device_class_list(self, server):
+        """[device, class, device, class, ...], with the admin device"""
+        self._tango.db_call()
+        lst = ["dserver/" + server.lower(), "DServer"]
+        for dev in self._devices():
+            if dev.server == server:
+                lst += [dev.name, dev.dev_class]
+        return DbDatum(lst)
+
+
+class FakeDeviceProxy(object):
+    """PyTango.DeviceProxy of a device of the fake Tango system, the
+    attributes and commands can be used by name as in PyTango"""
+
+    def __init__(self, tango, name):
+        tango.get(name)
+        self.__dict__.update(
+            _tango=tango, _name=name, _requests={}, _next_id=0,
+            _timeout=3000)
+        with tango._lock:
+            tango.proxies += 1
+
+    @property
+    def _device(self):
+        # looked up at every call, the proxy survives a server restart,
+        # i.e. a new device added with the same name
+        return self._tango.get(self._name)
+
+    def name(self):
+        return self._device.name
+
+    def dev_name(self):
+        return self._device.name
+
+    def get_timeout_millis(self):
+        return self._timeout
+
+    def set_timeout_millis(self, timeout):
+        self.__dict__["_timeout"] = timeout
+
+    def info(self):
+        self._tango.round_trip()
+        return types.SimpleNamespace(
+            dev_class=self._device.dev_class,
+            server_id=self._device.server, server_host="haso",
+            server_version=5, doc_url="")
+
+    def ping(self):
+        self._tango.round_trip()
+        return int(self._tango.latency * 1e6)
+
+    def state(self):
+        self._tango.round_trip()
+        return self._device.state()
+
+    def status(self):
+        self._tango.round_trip()
+        return self._device.status()
+
+    def get_attribute_list(self):
+        self._tango.round_trip()
+        return sorted(self._device._attr_names.values())
+
+    def command_list_query(self):
+        self._tango.round_trip()
+        return [CommandInfo(cmd)
+                for cmd in sorted(self._device._cmd_names.values())]
+
+    def get_property(self, names):
+        self._tango.db_call()
+        if isinstance(names, str):
+            names = [names]
+        return dict((name, list(self._device.properties.get(name, [])))
+                    for name in names)
+
+    def _read(self, names):
+        return [DeviceAttribute(self._device.attr_name(name),
+                                self._device.read(name)) for name in names]
+
+    def read_attribute(self, name):
+        self._tango.round_trip()
+        return self._read([name])[0]
+
+    def read_attributes(self, names):
+        self._tango.round_trip()
+        return self._read(names)
+
+    def write_attribute(self, name, value):
+        self._tango.round_trip()
+        self._device.write(name, value)
+
+    def write_attributes(self, name_values):
+        self._tango.round_trip()
+        for name, value in name_values:
+            self._device.write(name, value)
+
+    def command_inout(self, name, argin=None):
+        self._tango.round_trip()
+        return self._device.command(name, argin)
+
+    def _send(self, request):
+        # the replies are ready one latency after the request, requests
+        # sent together are served concurrently
+        self._tango.round_trip(wait=False)
+        req_id = self._next_id
+        self.__dict__["_next_id"] += 1
+        self._requests[req_id] = (time.time() + self._tango.latency,
+                                  request)
+        return req_id
+
+    def _reply(self, req_id):
+        ready, request = self._requests.pop(req_id)
+        delay = ready - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return request()
+
+    def read_attributes_asynch(self, names):
+        return self._send(lambda: self._read(names))
+
+    def read_attributes_reply(self, req_id, timeout=0):
+        return self._reply(req_id)
+
+    def command_inout_asynch(self, name, argin=None):
+        return self._send(lambda: self._device.command(name, argin))
+
+    def command_inout_reply(self, req_id, timeout=0):
+        return self._reply(req_id)
+
+    def subscribe_event(self, attr, event_type, callback, filters=[],
+                        stateless=False):
+        # the devices of the fake system send no events
+        self._tango.round_trip()
+        raise PyTango.DevFailed(
+            "%s: no event configured for %s" % (self._device.name, attr))
+
+    def unsubscribe_event(self, event_id):
+        pass
+
+    def __getattr__(self, name):
+        if "_tango" not in self.__dict__:
+            raise AttributeError(name)
+        device = self._device
+        if device.has_attribute(name):
+            return self.read_attribute(name).value
+        if device.has_command(name):
+            return lambda argin=None: self.command_inout(name, argin)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if self._device.has_attribute(name):
+            self.write_attribute(name, value)
+        else:
+            self.__dict__[name] = value
+
+    def __repr__(self):
+        return "FakeDeviceProxy(%s)" % self._name
+
+
+class FakePool(object):
+    """Calls the methods of a controller in the order of the Sardana pool
+
+    The point methods, count(), move(), etc., return the values read. A
+    point polls the state every poll_period s until no axis is MOVING,
+    like Sardana the values are read at every read_every-th poll, the
+    controllers which take the state from the reads depend on it. calls
+    counts the controller calls and ctrl_time sums their
+    durations, the time the pool waits for the controller.
+    """
+
+    def __init__(self, ctrl, axes, poll_period=0.001, read_every=10,
+                 timeout=10.):
+        self.ctrl = ctrl
+        self.axes = list(axes)
+        self.poll_period = poll_period
+        self.read_every = read_every
+        self.timeout = timeout
+        self.calls = 0
+        self.ctrl_time = 0.
+        self.states = {}
+
+    def call(self, method, *args):
+        start = time.time()
+        try:
+            return getattr(self.ctrl, method)(*args)
+        finally:
+            self.ctrl_time += time.time() - start
+            self.calls += 1
+
+    def state(self):
+        """{axis: state} of the axes"""
+        self.call("PreStateAll")
+        for axis in self.axes:
+            self.call("PreStateOne", axis)
+        self.call("StateAll")
+        self.states = dict(
+            (axis, self.call("StateOne", axis)[0]) for axis in self.axes)
+        return self.states
+
+    def moving(self):
+        return any(state in (PyTango.DevState.MOVING,
+                             PyTango.DevState.RUNNING)
+                   for state in self.state().values())
+
+    def read(self):
+        """{axis: value} of the axes"""
+        self.call("PreReadAll")
+        for axis in self.axes:
+            self.call("PreReadOne", axis)
+        self.call("ReadAll")
+        return dict((axis, self.call("ReadOne", axis)) for axis in self.axes)
+
+    def start(self, values):
+        self.call("PreStartAll")
+        for axis in self.axes:
+            if self.call("PreStartOne", axis, values[axis]) is False:
+                raise RuntimeError("PreStartOne(%d) failed" % axis)
+        for axis in self.axes:
+            self.call("StartOne", axis, values[axis])
+        self.call("StartAll")
+
+    def wait(self, repetitions=False):
+        """Poll the state until no axis moves, the values are read with
+        every read_every-th poll and at the end. Returns the final values
+        or with repetitions {axis: [value, ...]} of all reads."""
+        values = dict((axis, []) for axis in self.axes)
+        start = time.time()
+        poll = 0
+        while True:
+            moving = self.moving()
+            if moving and poll % self.read_every == 0:
+                self._collect(values, repetitions)
+            if not moving:
+                break
+            if time.time() - start > self.timeout:
+                raise RuntimeError("%s still MOVING after %g s" % (
+                    self.ctrl.inst_name, self.timeout))
+            time.sleep(self.poll_period)
+            poll += 1
+        self._collect(values, repetitions)
+        return values
+
+    def _collect(self, values, repetitions):
+        for axis, value in self.read().items():
+            if repetitions:
+                values[axis].extend(value)
+            else:
+                values[axis] = value
+
+    def count(self, integ_time, repetitions=1, latency_time=0.,
+              master=None):
+        """Acquire a point of a ct or step scan, master is the timer
+        axis, by default the first. With repetitions the values of the
+        triggers are collected from the reads while acquiring."""
+        if master is None:
+            master = self.axes[0]
+        self.call("LoadOne", master, integ_time, repetitions, latency_time)
+        self.start(dict((axis, integ_time) for axis in self.axes))
+        return self.wait(repetitions > 1)
+
+    def move(self, positions):
+        """Move the axes to {axis: position}"""
+        self.start(positions)
+        return self.wait()
+
+    def acquire_0d(self, integ_time):
+        """Read the values while integ_time elapses, {axis: mean}"""
+        self.start(dict((axis, integ_time) for axis in self.axes))
+        values = dict((axis, []) for axis in self.axes)
+        start = time.time()
+        while True:
+            for axis, value in self.read().items():
+                values[axis].append(value)
+            if time.time() - start >= integ_time:
+                break
+            time.sleep(self.poll_period)
+        self.state()
+        return dict((axis, float(numpy.mean(value)))
+                    for axis, value in values.items())
+
+    def calc(self, counter_values):
+        """Values of the pseudo counter axes for the counter values"""
+        return dict((axis, self.call("Calc", axis, counter_values))
+                    for axis in self.axes)
+
+
+#
+# Benchmarks
+#
+# The tests marked benchmark run with the option --benchmark, e.g.
+#   python -m pytest -q test --benchmark -m benchmark
+# the lines they report are printed at the end.
+#
+_benchmark_report = []
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="run the benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: a benchmark, run with --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _benchmark_report:
+        terminalreporter.section("benchmarks")
+        for line in _benchmark_report:
+            terminalreporter.write_line(line)
+
+
+#
+# Fixtures
+#
+@pytest.fixture
+def report():
+    """report(line) adds a line to the benchmark results"""
+    return _benchmark_report.append
+
+
+@pytest.fixture(autouse=True)
+def controller_caches(tmp_path, monkeypatch):
+    """Every test starts with empty HasyTangoLib caches, the cache files
+    are in the tmp_path of the test"""
+    monkeypatch.setenv("SARDANA_CONTROLLER_CACHE", str(tmp_path / "cache"))
+    monkeypatch.delenv("SARDANA_DEVICE_CACHE_TTL", raising=False)
+    monkeypatch.setenv("TANGO_HOST", TANGO_HOST)
+    for name in ("_databases", "_exported", "_proxies", "_capabilities"):
+        monkeypatch.setattr(HasyTangoLib, name, {})
+    monkeypatch.setattr(HasyTangoLib, "_capabilities_verified", set())
+    monkeypatch.setattr(
+        HasyTangoLib, "_state_cache", HasyTangoLib.AttributeCache(
+            max_age=HasyTangoLib.STATE_POLL_PERIOD,
+            max_stale=HasyTangoLib.STATE_MAX_STALE))
+
+
+@pytest.fixture
+def tango(monkeypatch):
+    """The fake Tango system used by PyTango.Database and
+    PyTango.DeviceProxy"""
+    fake = FakeTango()
+    monkeypatch.setattr(PyTango, "Database", fake.Database)
+    monkeypatch.setattr(PyTango, "DeviceProxy", fake.DeviceProxy)
+    return fake
+
+
+@pytest.fixture
+def pool(tango):
+    """pool(ctrl_class, axes, **props) creates a controller with its
+    axes and returns its FakePool, TangoHost defaults to TANGO_HOST.
+    The axes are deleted after the test."""
+    pools = []
+
+    def create(ctrl_class, axes, **props):
+        if "TangoHost" in getattr(ctrl_class, "ctrl_properties", {}):
+            props.setdefault("TangoHost", TANGO_HOST)
+        ctrl = ctrl_class(ctrl_class.__name__.lower(), props)
+        for axis in axes:
+            ctrl.AddDevice(axis)
+        pools.append(FakePool(ctrl, axes))
+        return pools[-1]
+
+    yield create
+    for fake in pools:
+        for axis in fake.axes:
+            fake.ctrl.DeleteDevice(axis)
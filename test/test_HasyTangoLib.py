@@ -0,0 +1,650 @@
+#!/usr/bin/env python
+import json
+import threading
+import time
+import types
+
+import numpy
+import pytest
+
+import HasyTangoLib
+import PyTango
+
+TANGO_HOST = "haso:10000"
+
+
+class Attribute(object):
+
+    def __init__(self, name, value, has_failed=False):
+        self.name = name
+        self.value = value
+        self.has_failed = has_failed
+
+
+class Event(object):
+
+    def __init__(self, value=None, err=False):
+        self.err = err
+        self.attr_value = None if err else Attribute("", value)
+
+
+class FakeProxy(object):
+    """Device with attributes, asynchronous requests and change events"""
+
+    def __init__(self, values=None, events=True):
+        self.values = dict(values or {})
+        self.events = events
+        self.callbacks = {}
+        self.reads = 0
+        self.writes = []
+        self.failing = set()
+        self.on_read = None
+        self.unsubscribed = []
+        self.on_unsubscribe = None
+        self.limit = float("inf")
+        self._requests = {}
+
+    def read_attribute(self, name):
+        self.reads += 1
+        if self.on_read is not None:
+            self.on_read()
+        return Attribute(name, self.values[name])
+
+    def read_attributes(self, names):
+        self.reads += 1
+        return [Attribute(name, self.values.get(name),
+                          name in self.failing or name not in self.values)
+                for name in names]
+
+    def write_attribute(self, name, value):
+        # the device clamps the values to its limit
+        self.values[name] = min(value, self.limit)
+
+    def write_attributes(self, values):
+        if "write" in self.failing:
+            raise RuntimeError("write failed")
+        self.writes.append(list(values))
+        self.values.update(values)
+
+    def read_attributes_asynch(self, names):
+        if "asynch" in self.failing:
+            raise RuntimeError("device not exported")
+        req_id = len(self._requests) + 1
+        self._requests[req_id] = names
+        return req_id
+
+    def read_attributes_reply(self, req_id, timeout=0):
+        if "reply" in self.failing:
+            raise RuntimeError("timeout")
+        return self.read_attributes(self._requests.pop(req_id))
+
+    def subscribe_event(self, name, event_type, callback, filters, stateless):
+        if not self.events:
+            raise RuntimeError("events not configured")
+        self.callbacks[name] = callback
+        return len(self.callbacks)
+
+    def unsubscribe_event(self, event_id):
+        self.unsubscribed.append(event_id)
+        if self.on_unsubscribe is not None:
+            self.on_unsubscribe()
+
+    def push(self, name, value=None, err=False):
+        self.callbacks[name](Event(value, err))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the time of HasyTangoLib by a clock set by the test"""
+    now = [1000.]
+    monkeypatch.setattr(HasyTangoLib, "time",
+                        types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+#
+# roi_sums
+#
+def test_roi_sums():
+    data = numpy.arange(10)
+    sums = HasyTangoLib.roi_sums(data, [0, 2, 5], [10, 4, 6])
+    assert sums.tolist() == [45, 5, 5]
+
+
+def test_roi_sums_clips_like_slices():
+    data = numpy.arange(10)
+    sums = HasyTangoLib.roi_sums(data, [-3, 8, 6, 20], [3, 30, 2, 25])
+    assert sums.tolist() == [3, 17, 0, 0]
+
+
+def test_roi_sums_2d_data_is_flattened():
+    data = numpy.ones((4, 5))
+    assert HasyTangoLib.roi_sums(data, [0], [20]).tolist() == [20.]
+
+
+def test_roi_sums_unsigned_data_does_not_wrap():
+    data = numpy.array([250, 250, 3], dtype=numpy.uint8)
+    sums = HasyTangoLib.roi_sums(data, [0, 1], [3, 2])
+    assert sums.dtype == numpy.int64
+    assert sums.tolist() == [503, 250]
+
+
+def test_roi_sums_float32_accumulates_in_float64():
+    data = numpy.full(10 ** 6, 0.1, dtype=numpy.float32)
+    sums = HasyTangoLib.roi_sums(data, [0, 10 ** 6 - 10], [10 ** 6, 10 ** 6])
+    assert sums.dtype == numpy.float64
+    expected = 10 ** 6 * float(numpy.float32(0.1))
+    assert sums[0] == pytest.approx(expected, rel=1e-12)
+    assert sums[1] == pytest.approx(10 * float(numpy.float32(0.1)),
+                                    rel=1e-9)
+
+
+def test_roi_sums_empty_data():
+    assert HasyTangoLib.roi_sums([], [0], [5]).tolist() == [0.]
+
+
+@pytest.mark.benchmark
+def test_benchmark_roi_sums(report):
+    # 300 RoIs of an 8k channel spectrum against the former double loop
+    random = numpy.random.RandomState(0)
+    data = random.randint(0, 1000, 8192).astype(numpy.int32)
+    starts = random.randint(0, 8192, 300)
+    ends = numpy.minimum(starts + random.randint(1, 2000, 300), 8192)
+    start = time.time()
+    expected = []
+    for first, last in zip(starts, ends):
+        total = 0
+        for i in range(first, last):
+            total = total + data[i]
+        expected.append(total)
+    loop_time = time.time() - start
+    start = time.time()
+    for i in range(100):
+        sums = HasyTangoLib.roi_sums(data, starts, ends)
+    sums_time = (time.time() - start) / 100
+    assert sums.tolist() == expected
+    report("roi_sums 8192 channels 300 RoIs  double loop %8.2f ms"
+           "  roi_sums %6.3f ms" % (1e3 * loop_time, 1e3 * sums_time))
+
+
+#
+# RunningStatistics
+#
+def test_running_statistics_blocks_match_numpy():
+    samples = numpy.random.RandomState(7).normal(3., 2., 1000)
+    stats = HasyTangoLib.RunningStatistics()
+    for block in numpy.split(samples, [1, 100, 101, 600]):
+        stats.add(block)
+    stats.add([])
+    assert stats.count == 1000
+    assert stats.as_tuple() == pytest.approx(
+        (samples.mean(), samples.std(), samples.min(), samples.max(),
+         samples.sum()))
+
+
+def test_running_statistics_reset():
+    stats = HasyTangoLib.RunningStatistics()
+    assert stats.as_tuple() == (0., 0., 0., 0., 0.)
+    stats.add([1., 2., 3.])
+    stats.reset()
+    stats.add([5.])
+    assert stats.as_tuple() == (5., 0., 5., 5., 5.)
+
+
+#
+# read_written, write_changed
+#
+def test_read_written_skips_failed_attributes():
+    proxy = FakeProxy({"Gain": 2, "Offset": 0.5})
+    proxy.failing.add("Offset")
+    written = HasyTangoLib.read_written(proxy, ["Gain", "Offset", "Mode"])
+    assert written == {"Gain": 2}
+
+
+def test_write_changed_writes_only_changes():
+    proxy = FakeProxy({"Gain": 2, "Offset": 0.5})
+    written = HasyTangoLib.read_written(proxy, ["Gain", "Offset"])
+    names = HasyTangoLib.write_changed(
+        proxy, written, [("Gain", 2), ("Offset", 1.), ("Mode", 3)])
+    assert names == ["Offset", "Mode"]
+    assert proxy.writes == [[("Offset", 1.), ("Mode", 3)]]
+    assert written == {"Gain": 2, "Offset": 1., "Mode": 3}
+    assert HasyTangoLib.write_changed(
+        proxy, written, [("Gain", 2), ("Mode", 3)]) == []
+    assert len(proxy.writes) == 1
+
+
+def test_write_changed_failure_forgets_values():
+    proxy = FakeProxy()
+    written = {"Gain": 2, "Offset": 0.5}
+    proxy.failing.add("write")
+    with pytest.raises(RuntimeError):
+        HasyTangoLib.write_changed(proxy, written, [("Gain", 3)])
+    assert written == {"Offset": 0.5}
+
+
+#
+# AttributeCache
+#
+def test_attribute_cache_expiry_without_events(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=1.)
+    proxy = FakeProxy({"Position": 1.}, events=False)
+    assert cache.read(proxy, "Position") == 1.
+    proxy.values["Position"] = 2.
+    clock[0] += 0.5
+    assert cache.read(proxy, "Position") == 1.
+    clock[0] += 1.
+    assert cache.read(proxy, "Position") == 2.
+    assert proxy.reads == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_attribute_cache_events(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=1., max_stale=10.)
+    proxy = FakeProxy({"State": "ON"})
+    assert cache.read(proxy, "State") == "ON"
+    proxy.push("State", "MOVING")
+    clock[0] += 5.
+    assert cache.read(proxy, "State") == "MOVING"
+    assert proxy.reads == 1
+    # older than max_stale, read again even with events
+    clock[0] += 6.
+    proxy.values["State"] = "ON"
+    assert cache.read(proxy, "State") == "ON"
+    assert proxy.reads == 2
+    # an error event drops the value
+    proxy.push("State", err=True)
+    assert cache.read(proxy, "State") == "ON"
+    assert proxy.reads == 3
+
+
+def test_attribute_cache_invalidate(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=10.)
+    proxy = FakeProxy({"State": "ON", "Position": 1.}, events=False)
+    cache.read(proxy, "State")
+    cache.read(proxy, "Position")
+    cache.invalidate(proxy, "state")
+    cache.read(proxy, "Position")
+    assert proxy.reads == 2
+    cache.read(proxy, "State")
+    assert proxy.reads == 3
+    cache.invalidate(proxy)
+    cache.read(proxy, "Position")
+    assert proxy.reads == 4
+
+
+def test_attribute_cache_read_keeps_newer_event(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=1.)
+    proxy = FakeProxy({"State": "ON"})
+    proxy.on_read = lambda: proxy.push("State", "MOVING")
+    assert cache.read(proxy, "State") == "MOVING"
+    proxy.on_read = None
+    assert cache.read(proxy, "State") == "MOVING"
+    assert proxy.reads == 1
+
+
+def test_attribute_cache_read_does_not_store_after_invalidate(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=10.)
+    proxy = FakeProxy({"State": "ON"}, events=False)
+    proxy.on_read = lambda: cache.invalidate(proxy)
+    assert cache.read(proxy, "State") == "ON"
+    proxy.on_read = None
+    proxy.values["State"] = "MOVING"
+    assert cache.read(proxy, "State") == "MOVING"
+
+
+def test_attribute_cache_write_reads_accepted_value(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=10.)
+    proxy = FakeProxy({"SlewRate": 100.}, events=False)
+    proxy.limit = 500.
+    assert cache.read(proxy, "SlewRate") == 100.
+    cache.write(proxy, "SlewRate", 800.)
+    assert cache.read(proxy, "SlewRate") == 500.
+    assert cache.read(proxy, "SlewRate") == 500.
+    assert proxy.reads == 2
+
+
+def test_attribute_cache_unsubscribe_without_lock(clock):
+    cache = HasyTangoLib.AttributeCache(max_age=1.)
+    proxy = FakeProxy({"State": "ON", "Position": 1.})
+    cache.read(proxy, "State")
+    cache.read(proxy, "Position")
+    acquired = []
+
+    def push_event():
+        if cache._lock.acquire(timeout=1.):
+            cache._lock.release()
+            acquired.append(True)
+        else:
+            acquired.append(False)
+
+    def unsubscribe_event():
+        # Tango waits in unsubscribe_event() for a running callback
+        thread = threading.Thread(target=push_event)
+        thread.start()
+        thread.join()
+
+    proxy.on_unsubscribe = unsubscribe_event
+    cache.unsubscribe(proxy)
+    assert sorted(proxy.unsubscribed) == [1, 2]
+    assert acquired == [True, True]
+    assert cache.read(proxy, "State") == "ON"
+    assert proxy.reads == 3
+
+
+#
+# read_attributes_all
+#
+def test_read_attributes_all_order_and_errors():
+    proxies = [FakeProxy({"Value": i}) for i in range(5)]
+    proxies[1].failing.add("asynch")
+    proxies[3].failing.add("reply")
+    requests = [(proxy, ["Value"]) for proxy in proxies]
+    for max_pending in (None, 1, 2, 10):
+        results = HasyTangoLib.read_attributes_all(requests, max_pending)
+        assert [attrs[0].value for i, attrs in enumerate(results)
+                if i not in (1, 3)] == [0, 2, 4]
+        assert isinstance(results[1], RuntimeError)
+        assert isinstance(results[3], RuntimeError)
+
+
+def test_read_attributes_all_empty():
+    assert HasyTangoLib.read_attributes_all([]) == []
+
+
+def test_command_inout_all_is_concurrent(tango):
+    tango.add("DGG2", "p09/dgg2/eh.01", "p09/dgg2/eh.02")
+    proxies = [HasyTangoLib.get_proxy("p09/dgg2/eh.0%d" % i)
+               for i in (1, 2)]
+    tango.latency = 0.02
+    start = time.time()
+    results = HasyTangoLib.command_inout_all(
+        [(proxies[0], "Start"), (proxies[1], "State"),
+         (proxies[1], "NoCommand")])
+    assert time.time() - start < 0.04
+    assert results[0] is None
+    assert results[1] == PyTango.DevState.ON
+    assert isinstance(results[2], PyTango.DevFailed)
+    assert tango.get("p09/dgg2/eh.01").executed == ["Start"]
+    for proxy in proxies:
+        HasyTangoLib.release_proxy(proxy)
+
+
+#
+# device discovery
+#
+def test_get_device_exported_is_cached(tango):
+    tango.add("DGG2", "p09/dgg2/eh.01", "p09/dgg2/eh.02")
+    devices = ["p09/dgg2/eh.01", "p09/dgg2/eh.02"]
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        devices
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        devices
+    assert tango.db_calls == 1
+    # a restarted Pool reads the cache file
+    HasyTangoLib._exported.clear()
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        devices
+    assert tango.db_calls == 1
+
+
+def test_get_device_exported_without_cache(tango, monkeypatch, tmp_path):
+    monkeypatch.setenv("SARDANA_DEVICE_CACHE_TTL", "0")
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    for i in range(2):
+        assert HasyTangoLib.get_device_exported("p09/dgg2") == \
+            ["p09/dgg2/eh.01"]
+    assert tango.db_calls == 2
+    assert not (tmp_path / "cache").exists()
+
+
+def test_device_lists_keep_the_axis_order(tango):
+    tango.add("DGG2", "p09/dgg2/eh.02", "p09/dgg2/eh.03")
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        ["p09/dgg2/eh.02", "p09/dgg2/eh.03"]
+    # eh.02 is no more exported, eh.01 is new
+    del tango.devices["p09/dgg2/eh.02"]
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    HasyTangoLib.invalidate_device_exported("p09/dgg2", TANGO_HOST)
+    HasyTangoLib._exported.clear()
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        ["p09/dgg2/eh.02", "p09/dgg2/eh.03", "p09/dgg2/eh.01"]
+    assert tango.db_calls == 2
+
+
+def test_refresh_device_exported_appends_new_devices(tango):
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    known = HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST)
+    tango.add("DGG2", "p09/dgg2/eh.02")
+    assert HasyTangoLib.refresh_device_exported(
+        "p09/dgg2", TANGO_HOST, known) == ["p09/dgg2/eh.02"]
+    assert HasyTangoLib.get_device_exported("p09/dgg2", TANGO_HOST) == \
+        ["p09/dgg2/eh.01", "p09/dgg2/eh.02"]
+    assert tango.db_calls == 2
+
+
+def test_device_names_by_class_and_properties_are_cached(tango):
+    tango.add("EigerFilewriter", "p09/eiger/fw.01",
+              properties={"EigerDevice": ["p09/eiger/e4m"]})
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    for i in range(2):
+        assert HasyTangoLib.get_device_names_by_class(
+            "EigerFilewriter", TANGO_HOST) == ["p09/eiger/fw.01"]
+        assert HasyTangoLib.get_device_property(
+            "p09/eiger/fw.01", "EigerDevice", TANGO_HOST) == \
+            ["p09/eiger/e4m"]
+    assert tango.db_calls == 2
+    tango.add("EigerFilewriter", "p09/eiger/fw.02")
+    assert HasyTangoLib.get_device_names_by_class(
+        "EigerFilewriter", TANGO_HOST, refresh=True) == \
+        ["p09/eiger/fw.01", "p09/eiger/fw.02"]
+    assert HasyTangoLib.get_device_property(
+        "p09/eiger/fw.02", "EigerDevice", TANGO_HOST) == []
+    assert tango.db_calls == 4
+
+
+#
+# get_proxy, release_proxy
+#
+def test_get_proxy_is_shared(tango):
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    proxies = [HasyTangoLib.get_proxy(name) for name in (
+        "p09/dgg2/eh.01", "haso:10000/p09/dgg2/eh.01",
+        "tango://HASO:10000/p09/DGG2/eh.01")]
+    assert proxies[1] is proxies[0] and proxies[2] is proxies[0]
+    # connected at the first use
+    assert tango.proxies == 0
+    assert proxies[0].state() == PyTango.DevState.ON
+    assert proxies[1].read_attribute("SampleTime").value == 1.
+    assert tango.proxies == 1
+    for proxy in proxies[1:]:
+        HasyTangoLib.release_proxy(proxy)
+    assert HasyTangoLib._proxies == {"haso:10000/p09/dgg2/eh.01": proxies[0]}
+    HasyTangoLib.release_proxy(proxies[0])
+    assert HasyTangoLib._proxies == {}
+    HasyTangoLib.release_proxy(None)
+    # a new proxy after the last release
+    proxy = HasyTangoLib.get_proxy("p09/dgg2/eh.01")
+    assert proxy is not proxies[0]
+    HasyTangoLib.release_proxy(proxy)
+
+
+def test_release_proxy_unsubscribes_the_state(tango):
+    tango.add("DGG2", "p09/dgg2/eh.01")
+    proxy = HasyTangoLib.get_proxy("p09/dgg2/eh.01")
+    assert HasyTangoLib.read_state(proxy, True) == PyTango.DevState.ON
+    assert HasyTangoLib._state_cache._events
+    HasyTangoLib.release_proxy(proxy)
+    assert not HasyTangoLib._state_cache._events
+    assert not HasyTangoLib._state_cache._values
+
+
+#
+# get_capabilities
+#
+def test_get_capabilities_per_server_instance(tango):
+    tango.add("OmsVme58", "p09/motor/eh.01", "p09/motor/eh.02",
+              server="OmsVme58/EH")
+    tango.add("OmsVme58", "p09/motor/exp.01", server="OmsVme58/EXP",
+              Encoder=0.)
+    proxies = [HasyTangoLib.get_proxy(name) for name in (
+        "p09/motor/eh.01", "p09/motor/eh.02", "p09/motor/exp.01")]
+    profile = HasyTangoLib.get_capabilities(proxies[0], TANGO_HOST)
+    assert profile["dev_class"] == "OmsVme58"
+    assert "Position" in profile["attributes"]
+    assert "StopMove" in profile["commands"]
+    # the same server instance costs the info() call
+    tango.reset_counters()
+    assert HasyTangoLib.get_capabilities(proxies[1], TANGO_HOST) == profile
+    assert tango.round_trips == 1
+    other = HasyTangoLib.get_capabilities(proxies[2], TANGO_HOST)
+    assert "Encoder" in other["attributes"]
+    assert "Encoder" not in profile["attributes"]
+    for proxy in proxies:
+        HasyTangoLib.release_proxy(proxy)
+
+
+def test_get_capabilities_verifies_the_cache_file(tango):
+    tango.add("OmsVme58", "p09/motor/eh.01", server="OmsVme58/EH")
+    proxy = HasyTangoLib.get_proxy("p09/motor/eh.01")
+    HasyTangoLib.get_capabilities(proxy, TANGO_HOST)
+    # a restarted Pool reads the profile from the file and verifies it
+    # once with the attribute list
+    HasyTangoLib._capabilities.clear()
+    HasyTangoLib._capabilities_verified.clear()
+    tango.reset_counters()
+    profile = HasyTangoLib.get_capabilities(proxy, TANGO_HOST)
+    assert tango.round_trips == 2
+    # the server was updated
+    tango.add("OmsVme58", "p09/motor/eh.01", server="OmsVme58/EH",
+              Encoder=0.)
+    HasyTangoLib._capabilities.clear()
+    HasyTangoLib._capabilities_verified.clear()
+    updated = HasyTangoLib.get_capabilities(proxy, TANGO_HOST)
+    assert "Encoder" in updated["attributes"]
+    assert "Encoder" not in profile["attributes"]
+    HasyTangoLib.release_proxy(proxy)
+
+
+#
+# instrument, SendToCtrl("stats")
+#
+class Controller(object):
+
+    def SendToCtrl(self, in_data):
+        return "base %s" % in_data
+
+
+class Device(object):
+
+    def read(self):
+        return 1
+
+
+@pytest.fixture
+def pooled_device(monkeypatch):
+    monkeypatch.setattr(HasyTangoLib.PyTango, "DeviceProxy",
+                        lambda name: Device(), raising=False)
+    proxy = HasyTangoLib.get_proxy("test/instrument/01")
+    yield proxy
+    HasyTangoLib.release_proxy(proxy)
+
+
+def test_instrument_stats(pooled_device):
+
+    @HasyTangoLib.instrument
+    class Ctrl(Controller):
+
+        def ReadOne(self, ind):
+            pooled_device.read()
+            return pooled_device.read() + ind
+
+        def StateOne(self, ind):
+            return self.ReadOne(ind)
+
+    ctrl = Ctrl()
+    assert ctrl.ReadOne(1) == 2
+    assert ctrl.StateOne(2) == 3
+    stats = json.loads(ctrl.SendToCtrl("stats"))
+    assert stats["methods"]["ReadOne"]["calls"] == 2
+    assert stats["methods"]["ReadOne"]["round_trips"] == 4
+    # the nested ReadOne counts for StateOne too
+    assert stats["methods"]["StateOne"]["round_trips"] == 2
+    assert sum(stats["methods"]["ReadOne"]["histogram"]) == 2
+    assert len(stats["bins"]) + 1 == len(
+        stats["methods"]["ReadOne"]["histogram"])
+    assert ctrl.SendToCtrl("other") == "base other"
+    assert ctrl.SendToCtrl("stats reset") == "stats reset"
+    assert json.loads(ctrl.SendToCtrl("STATS"))["methods"] == {}
+
+
+def test_instrument_stats_dump(tmp_path):
+
+    @HasyTangoLib.instrument
+    class Ctrl(Controller):
+
+        def ReadOne(self, ind):
+            return ind
+
+        def SendToCtrl(self, in_data):
+            return "own %s" % in_data
+
+    ctrl = Ctrl()
+    ctrl.ReadOne(1)
+    file_name = str(tmp_path / "stats.json")
+    assert ctrl.SendToCtrl("stats dump %s" % file_name) == \
+        "stats written to %s" % file_name
+    with open(file_name) as fd:
+        assert json.load(fd)["methods"]["ReadOne"]["calls"] == 1
+    assert ctrl.SendToCtrl("other") == "own other"
+    assert ctrl.SendToCtrl("stats dump").startswith("usage")
+
+
+def test_instrument_without_round_trips():
+
+    @HasyTangoLib.instrument(round_trips=False)
+    class Ctrl(Controller):
+
+        def ReadOne(self, ind):
+            return ind
+
+    ctrl = Ctrl()
+    assert ctrl.ReadOne(3) == 3
+    stats = json.loads(ctrl.SendToCtrl("stats"))
+    assert stats["methods"]["ReadOne"]["round_trips"] is None
+
+
+def test_instrument_calc():
+
+    @HasyTangoLib.instrument(round_trips=False)
+    class Ctrl(Controller):
+
+        def Calc(self, index, counter_values):
+            return sum(counter_values)
+
+    class SubCtrl(Ctrl):
+        pass
+
+    ctrl = SubCtrl()
+    assert ctrl.Calc(1, [1, 2]) == 3
+    stats = json.loads(ctrl.SendToCtrl("stats"))
+    assert stats["methods"]["Calc"]["calls"] == 1
+
+
+def test_call_stats_concurrent_records():
+    stats = HasyTangoLib.CallStats()
+
+    def record():
+        for i in range(2000):
+            stats.record("ReadOne", 1e-4, 1)
+            stats.record("StateOne", 1e-4, 2)
+
+    threads = [threading.Thread(target=record) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    methods = stats.as_dict()["methods"]
+    assert methods["ReadOne"]["calls"] == 8000
+    assert methods["StateOne"]["round_trips"] == 16000
+    assert sum(methods["StateOne"]["histogram"]) == 8000
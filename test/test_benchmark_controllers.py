@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+#
+# Overhead per scan point of the controllers
+#
+# Every controller acquires POINTS points of INTEG_TIME s, or moves its
+# axes POINTS times, from devices answering after LATENCY s. Reported
+# per point are the time spent in the controller methods, the dead time
+# (duration of the point less INTEG_TIME) and the Tango round trips.
+# The SIS3820 benchmark compares the concurrent ReadAll with the reads
+# channel by channel of ReadOne. The startup benchmark creates the
+# controllers of a beamline from a database answering after DB_LATENCY s.
+#
+#   python -m pytest -q test --benchmark -m benchmark
+#
+import time
+
+import numpy
+import pytest
+
+import HasyTangoLib
+from sardana.PoolController.twod import EigerDectris
+
+from sardana.PoolController.countertimer.DGG2Ctrl import DGG2Ctrl
+from sardana.PoolController.countertimer.HasyRoIsCtrl import HasyRoIsCtrl
+from sardana.PoolController.countertimer.SIS3820Ctrl import SIS3820Ctrl
+from sardana.PoolController.countertimer.VFCADCCtrl import VFCADCCtrl
+from sardana.PoolController.ioregister.SIS3610Ctrl import SIS3610Ctrl
+from sardana.PoolController.motor.HasyMotorCtrl import HasyMotorCtrl
+from sardana.PoolController.oned.HasyOneDCtrl import HasyOneDCtrl
+from sardana.PoolController.pseudocounter.MCA2SCACtrl import MCA2SCAsCtrl
+from sardana.PoolController.twod.EigerDectris import EigerDectrisCtrl
+from sardana.PoolController.twod.Lambda import LambdaCtrl
+from sardana.PoolController.twod.LimaCCD import LimaCCDCtrl
+from sardana.PoolController.zerod.HasyADCCtrl import HasyADCCtrl
+
+pytestmark = pytest.mark.benchmark
+
+LATENCY = 0.0005
+INTEG_TIME = 0.01
+POINTS = 20
+NB_CHANNELS = 8
+DB_LATENCY = 0.001
+NB_SERVERS = 100
+TANGO_HOST = "haso:10000"
+
+
+def names(root, nb=NB_CHANNELS):
+    return ["%s/eh.%02d" % (root, i) for i in range(1, nb + 1)]
+
+
+def count(fake):
+    return fake.count(INTEG_TIME)
+
+
+def acquire_0d(fake):
+    return fake.acquire_0d(INTEG_TIME)
+
+
+def move(fake):
+    # 0.01 and back, 0.1 ms at 100 units/s
+    fake.position = 0.01 - getattr(fake, "position", 0.)
+    return fake.move(dict((axis, fake.position) for axis in fake.axes))
+
+
+def write_read(fake):
+    for axis in fake.axes:
+        fake.call("WriteOne", axis, 1)
+    fake.state()
+    return dict((axis, fake.call("ReadOne", axis)) for axis in fake.axes)
+
+
+SPECTRUM = numpy.arange(8192) % 100
+
+
+def calc(fake):
+    return fake.calc([SPECTRUM])
+
+
+def set_rois(fake):
+    for axis in fake.axes:
+        fake.ctrl.SetAxisExtraPar(axis, "RoI1", 100 * axis)
+        fake.ctrl.SetAxisExtraPar(axis, "RoI2", 100 * axis + 50)
+
+
+def set_hasy_rois(fake):
+    for axis in fake.axes:
+        fake.ctrl.SetAxisExtraPar(axis, "RoIStart", 100 * axis)
+        fake.ctrl.SetAxisExtraPar(axis, "RoIEnd", 100 * axis + 50)
+
+
+def add_eiger(tango):
+    tango.add("EigerDectris", "p09/eiger/e4m",
+              properties={"APIVersion": ["1.8.0"]})
+    tango.add("EigerFilewriter", "p09/eiger/fw",
+              properties={"EigerDevice": ["p09/eiger/e4m"]})
+
+
+# name, controller, axes, properties, devices, setup of the axes, point
+CONTROLLERS = [
+    ("SIS3820", SIS3820Ctrl, NB_CHANNELS,
+     {"RootDeviceName": "p09/sis3820"},
+     lambda tango: tango.add("SIS3820", *names("p09/sis3820")),
+     None, count),
+    ("DGG2", DGG2Ctrl, 1, {"RootDeviceName": "p09/dgg2"},
+     lambda tango: tango.add("DGG2", "p09/dgg2/eh.01"), None, count),
+    ("VFCADC", VFCADCCtrl, NB_CHANNELS, {"RootDeviceName": "p09/vfc"},
+     lambda tango: tango.add("VFCADC", *names("p09/vfc")), None, count),
+    ("HasyRoIs", HasyRoIsCtrl, NB_CHANNELS,
+     {"RootDeviceName": "p09/mca/eh.01"},
+     lambda tango: tango.add("MCA_8701", "p09/mca/eh.01"),
+     set_hasy_rois, count),
+    ("HasyADC", HasyADCCtrl, NB_CHANNELS, {"RootDeviceName": "p09/adc"},
+     lambda tango: tango.add("ADC", *names("p09/adc")), None, acquire_0d),
+    ("HasyOneD", HasyOneDCtrl, 1, {"RootDeviceName": "p09/mca"},
+     lambda tango: tango.add("MCA_8701", "p09/mca/eh.01"), None, count),
+    ("LimaCCD", LimaCCDCtrl, 1, {"RootDeviceName": "p09/lima"},
+     lambda tango: tango.add("LimaCCD", "p09/lima/eh.01"), None, count),
+    ("EigerDectris", EigerDectrisCtrl, 1,
+     {"RootDeviceName": "p09/eiger/e4m"}, add_eiger, None, count),
+    ("Lambda", LambdaCtrl, 1, {"RootDeviceName": "p09/lambda"},
+     lambda tango: tango.add("LambdaDetector", "p09/lambda/eh.01"),
+     None, count),
+    ("HasyMotor", HasyMotorCtrl, NB_CHANNELS,
+     {"RootDeviceName": "p09/motor"},
+     lambda tango: tango.add("OmsVme58", *names("p09/motor")), None, move),
+    ("SIS3610", SIS3610Ctrl, NB_CHANNELS, {"RootDeviceName": "p09/sis3610"},
+     lambda tango: tango.add("SIS3610In", *names("p09/sis3610")),
+     None, write_read),
+    ("MCA2SCAs", MCA2SCAsCtrl, 8, {}, lambda tango: None, set_rois, calc),
+]
+
+
+@pytest.mark.parametrize(
+    "name, ctrl_class, nb_axes, props, add_devices, setup, point",
+    CONTROLLERS, ids=[spec[0] for spec in CONTROLLERS])
+def test_benchmark_scan_point(tango, pool, report, name, ctrl_class,
+                              nb_axes, props, add_devices, setup, point):
+    add_devices(tango)
+    fake = pool(ctrl_class, range(1, nb_axes + 1), **props)
+    if setup is not None:
+        setup(fake)
+    # the first point connects the devices
+    assert point(fake) is not None
+    tango.latency = LATENCY
+    tango.reset_counters()
+    fake.ctrl_time = 0.
+    start = time.time()
+    for i in range(POINTS):
+        point(fake)
+    duration = (time.time() - start) / POINTS
+    if point in (count, acquire_0d):
+        dead_time = "%7.2f" % (1e3 * (duration - INTEG_TIME))
+    else:
+        dead_time = "%7s" % "-"
+    report("scan point %-13s %2d axes  controller %7.2f ms  dead time %s ms"
+           "  round trips %5.1f" % (
+               name, nb_axes, 1e3 * fake.ctrl_time / POINTS, dead_time,
+               float(tango.round_trips) / POINTS))
+
+
+#
+# SIS3820: concurrent ReadAll against the former ReadOne per channel
+#
+def read_one_by_one(fake):
+    # ReadAll has no channels, ReadOne reads Counts, and State after the
+    # integration, of each channel
+    fake.call("PreReadAll")
+    return dict((axis, fake.call("ReadOne", axis)) for axis in fake.axes)
+
+
+@pytest.mark.parametrize("nb_channels", [8, 32, 64])
+def test_benchmark_sis3820_read(tango, pool, report, nb_channels):
+    tango.add("SIS3820", *names("p09/sis3820", nb_channels), Counts=5)
+    fake = pool(SIS3820Ctrl, range(1, nb_channels + 1),
+                RootDeviceName="p09/sis3820")
+    for how in ("ReadAll", "ReadOne"):
+        if how == "ReadOne":
+            fake.read = lambda: read_one_by_one(fake)
+        assert set(fake.count(INTEG_TIME).values()) == set([5])
+        tango.latency = LATENCY
+        tango.reset_counters()
+        start = time.time()
+        for i in range(POINTS):
+            fake.count(INTEG_TIME)
+        duration = (time.time() - start) / POINTS
+        tango.latency = 0.
+        report("SIS3820 %2d channels %-8s dead time %7.2f ms"
+               "  round trips %6.1f" % (
+                   nb_channels, how, 1e3 * (duration - INTEG_TIME),
+                   float(tango.round_trips) / POINTS))
+
+
+#
+# startup
+#
+STARTUP = [
+    (SIS3820Ctrl, 32, {"RootDeviceName": "p09/sis3820"}),
+    (DGG2Ctrl, 2, {"RootDeviceName": "p09/dgg2"}),
+    (VFCADCCtrl, 8, {"RootDeviceName": "p09/vfc"}),
+    (HasyMotorCtrl, 32, {"RootDeviceName": "p09/motor"}),
+    (EigerDectrisCtrl, 1, {"RootDeviceName": "p09/eiger/e4m"}),
+]
+
+
+def start_pool(tango, pool):
+    tango.reset_counters()
+    start = time.time()
+    for ctrl_class, nb_axes, props in STARTUP:
+        pool(ctrl_class, range(1, nb_axes + 1), **props)
+    return time.time() - start, tango.db_calls
+
+
+def test_benchmark_startup(tango, pool, report, monkeypatch):
+    tango.add("SIS3820", *names("p09/sis3820", 32))
+    tango.add("DGG2", *names("p09/dgg2", 2))
+    tango.add("VFCADC", *names("p09/vfc", 8))
+    tango.add("OmsVme58", *names("p09/motor", 32))
+    add_eiger(tango)
+    # the other servers of the beamline
+    for i in range(NB_SERVERS):
+        tango.add("ADC", "p09/adc/s%02d" % i, server="ADC/s%02d" % i)
+    tango.db_latency = DB_LATENCY
+    results = [("cold cache", start_pool(tango, pool))]
+    # a restarted Pool reads the cache file
+    HasyTangoLib._exported.clear()
+    results.append(("warm cache", start_pool(tango, pool)))
+    monkeypatch.setenv("SARDANA_DEVICE_CACHE_TTL", "0")
+    HasyTangoLib._exported.clear()
+    results.append(("no cache", start_pool(tango, pool)))
+    # the filewriter lookup of the Eiger controller before the cache,
+    # a scan of the classes of all servers
+    tango.reset_counters()
+    start = time.time()
+    name_fw = None
+    for name in EigerDectris.getDeviceNamesByClass(
+            "EigerFilewriter", tangoHost=TANGO_HOST):
+        if EigerDectris.getDeviceProperty(
+                name, "EigerDevice", tangoHost=TANGO_HOST)[0] == \
+                "p09/eiger/e4m":
+            name_fw = name
+    assert name_fw == "p09/eiger/fw"
+    results.append(("old Eiger server scan",
+                    (time.time() - start, tango.db_calls)))
+    assert results[1][1][1] == 0
+    for what, (duration, db_calls) in results:
+        report("startup %-22s %8.1f ms  database calls %4d" % (
+            what, 1e3 * duration, db_calls))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+#
+# The controllers acquiring scan points from the devices of the fake
+# Tango system, see conftest.py
+#
+import json
+
+import numpy
+import pytest
+
+import PyTango
+
+import HasyTangoLib
+from sardana.PoolController.countertimer.DGG2Ctrl import DGG2Ctrl
+from sardana.PoolController.countertimer.HasyRoIsCtrl import HasyRoIsCtrl
+from sardana.PoolController.countertimer.SIS3820Ctrl import SIS3820Ctrl
+from sardana.PoolController.countertimer.VFCADCCtrl import VFCADCCtrl
+from sardana.PoolController.ioregister.SIS3610Ctrl import SIS3610Ctrl
+from sardana.PoolController.motor.HasyMotorCtrl import HasyMotorCtrl
+from sardana.PoolController.oned.HasyOneDCtrl import HasyOneDCtrl
+from sardana.PoolController.pseudocounter.MCA2SCACtrl import MCA2SCAsCtrl
+from sardana.PoolController.twod.EigerDectris import EigerDectrisCtrl
+from sardana.PoolController.twod.Lambda import LambdaCtrl
+from sardana.PoolController.twod.LimaCCD import LimaCCDCtrl
+from sardana.PoolController.zerod.HasyADCCtrl import HasyADCCtrl
+
+ON = PyTango.DevState.ON
+MOVING = PyTango.DevState.MOVING
+
+
+def add_eiger(tango):
+    tango.add("EigerDectris", "p09/eiger/e4m",
+              properties={"APIVersion": ["1.8.0"]})
+    tango.add("EigerFilewriter", "p09/eiger/fw",
+              properties={"EigerDevice": ["p09/eiger/e4m"]})
+
+
+#
+# counter/timer
+#
+def test_sis3820_count(tango, pool):
+    tango.add("SIS3820", "p09/sis3820/eh.01", Counts=10)
+    tango.add("SIS3820", "p09/sis3820/eh.02", Counts=20)
+    sis = pool(SIS3820Ctrl, [1, 2], RootDeviceName="p09/sis3820")
+    assert sis.count(0.02) == {1: 10, 2: 20}
+    assert set(sis.state().values()) == set([ON])
+    assert tango.get("p09/sis3820/eh.01").executed == ["Reset"]
+
+
+def test_sis3820_reads_channels_concurrently(tango, pool):
+    tango.add("SIS3820", *["p09/sis3820/eh.%02d" % i for i in range(1, 9)])
+    sis = pool(SIS3820Ctrl, range(1, 9), RootDeviceName="p09/sis3820")
+    sis.count(0.01)
+    tango.latency = 0.01
+    tango.reset_counters()
+    sis.ctrl_time = 0.
+    sis.read()
+    # one request per channel for Counts and State, sent together
+    assert tango.round_trips == 8
+    assert sis.ctrl_time < 0.04
+
+
+def test_dgg2_count(tango, pool):
+    dgg2 = tango.add("DGG2", "p09/dgg2/eh.01")
+    timer = pool(DGG2Ctrl, [1], RootDeviceName="p09/dgg2")
+    values = timer.count(0.05)
+    assert dgg2.values["SampleTime"] == 0.05
+    assert values[1] == pytest.approx(0.05)
+    assert timer.state() == {1: ON}
+
+
+def test_dgg2_repetitions(tango, pool):
+    dgg2 = tango.add("DGG2", "p09/dgg2/eh.01")
+    timer = pool(DGG2Ctrl, [1], RootDeviceName="p09/dgg2")
+    values = timer.count(0.02, repetitions=3, latency_time=0.01)
+    assert values[1] == pytest.approx([0.02] * 3)
+    assert dgg2.executed.count("Start") == 3
+    # single values after the repetitions
+    assert timer.count(0.02)[1] == pytest.approx(0.02)
+
+
+def test_sis3820_buffered_repetitions(tango, pool):
+    tango.add("SIS3820", "p09/sis3820/eh.01", "p09/sis3820/eh.02",
+              Counts=7)
+    tango.add("SIS3820MCS", "p09/mcs/eh.01")
+    sis = pool(SIS3820Ctrl, [1, 2], RootDeviceName="p09/sis3820",
+               MCSDeviceName="p09/mcs/eh.01",
+               MCSCountAttribute="AcquiredTriggers")
+    values = sis.count(0.01, repetitions=5)
+    assert values[1] == [100, 200, 300, 400, 500]
+    assert values[2] == [101, 201, 301, 401, 501]
+    mcs = tango.get("p09/mcs/eh.01")
+    assert mcs.values["NbAcquisitions"] == 5
+    assert mcs.values["NbChannels"] == 2
+    # single values after the buffered acquisition
+    assert sis.count(0.01) == {1: 7, 2: 7}
+
+
+def test_vfcadc_resets_channels_concurrently(tango, pool):
+    tango.add("VFCADC", *["p09/vfc/eh.%02d" % i for i in range(1, 9)],
+              Counts=3)
+    vfc = pool(VFCADCCtrl, range(1, 9), RootDeviceName="p09/vfc")
+    tango.latency = 0.01
+    tango.reset_counters()
+    vfc.start(dict((axis, 0.1) for axis in vfc.axes))
+    assert tango.round_trips == 8
+    assert vfc.ctrl_time < 0.04
+    assert tango.get("p09/vfc/eh.08").executed == ["Reset"]
+    assert set(vfc.read().values()) == set([3])
+
+
+def test_hasy_rois_sums(tango, pool):
+    tango.add("MCA_8701", "p09/mca/eh.01")
+    rois = pool(HasyRoIsCtrl, [1, 2], RootDeviceName="p09/mca/eh.01")
+    rois.ctrl.SetAxisExtraPar(1, "RoIStart", 10)
+    rois.ctrl.SetAxisExtraPar(1, "RoIEnd", 19)
+    rois.ctrl.SetAxisExtraPar(2, "RoIStart", 95)
+    rois.ctrl.SetAxisExtraPar(2, "RoIEnd", 104)
+    values = rois.count(0.01)
+    assert values == {1: sum(range(10, 20)),
+                      2: 95 + 96 + 97 + 98 + 99 + 0 + 1 + 2 + 3 + 4}
+    assert tango.get("p09/mca/eh.01").executed[-2:] == ["Stop", "Read"]
+
+
+#
+# 0D, 1D, 2D
+#
+def test_hasy_adc_0d(tango, pool):
+    tango.add("ADC", "p09/adc/eh.01", Value=1.5)
+    adc = pool(HasyADCCtrl, [1], RootDeviceName="p09/adc")
+    adc.ctrl.SetAxisExtraPar(1, "Conversion", 2.)
+    assert adc.acquire_0d(0.01) == {1: 3.}
+
+
+def test_mca_oned(tango, pool):
+    mca = tango.add("MCA_8701", "p09/mca/eh.01")
+    mca.write("DataLength", 1024)
+    oned = pool(HasyOneDCtrl, [1], RootDeviceName="p09/mca")
+    oned.ctrl.SetAxisExtraPar(1, "RoI1Start", 0)
+    oned.ctrl.SetAxisExtraPar(1, "RoI1End", 10)
+    data = oned.count(0.02)[1]
+    assert len(data) == 1024
+    assert oned.ctrl.GetAxisExtraPar(1, "CountsRoI1") == sum(range(10))
+    assert mca.executed == ["State", "Stop", "Clear", "Start", "Stop", "Read"]
+
+
+def test_limaccd(tango, pool):
+    lima = tango.add("LimaCCD", "p09/lima/eh.01")
+    camera = pool(LimaCCDCtrl, [1], RootDeviceName="p09/lima")
+    camera.call("LoadOne", 1, 0.05, 1, 0.)
+    camera.start({1: 0.05})
+    assert camera.state() == {1: MOVING}
+    assert camera.wait() == {1: [(-1,), (-1,)]}
+    assert lima.values["acq_expo_time"] == 0.05
+    assert lima.executed == ["prepareAcq", "startAcq"]
+    assert camera.ctrl.GetAxisExtraPar(1, "LastImageReady") == 0
+
+
+def test_eiger_arms_once(tango, pool):
+    add_eiger(tango)
+    eiger = pool(EigerDectrisCtrl, [1], RootDeviceName="p09/eiger/e4m")
+    device = tango.get("p09/eiger/e4m")
+    eiger.count(0.02)
+    eiger.count(0.02)
+    assert [cmd for cmd in device.executed if cmd != "State"] == \
+        ["Arm", "Trigger", "Trigger"]
+    assert tango.get("p09/eiger/fw").state() == MOVING
+    assert device.values["CountTime"] == 0.02
+
+
+def test_eiger_filewriter_lookup_is_cached(tango, pool):
+    add_eiger(tango)
+    eiger = pool(EigerDectrisCtrl, [1], RootDeviceName="p09/eiger/e4m")
+    assert eiger.ctrl.tango_device_fw == ["p09/eiger/fw"]
+    assert eiger.ctrl.APIVersion == ["1", "8", "0"]
+    # a restarted Pool reads the cache file
+    HasyTangoLib._exported.clear()
+    tango.reset_counters()
+    eiger = pool(EigerDectrisCtrl, [1], RootDeviceName="p09/eiger/e4m")
+    assert eiger.ctrl.tango_device_fw == ["p09/eiger/fw"]
+    assert tango.db_calls == 0
+
+
+def test_lambda_running_is_moving(tango, pool):
+    detector = tango.add("LambdaDetector", "p09/lambda/eh.01")
+    camera = pool(LambdaCtrl, [1], RootDeviceName="p09/lambda")
+    camera.call("LoadOne", 1, 0.05, 1, 0.)
+    camera.start({1: 0.05})
+    assert detector.state() == PyTango.DevState.RUNNING
+    assert camera.state() == {1: MOVING}
+    camera.wait()
+    assert detector.values["ShutterTime"] == 50.
+
+
+#
+# motor, I/O register, pseudo counter
+#
+def test_motor_move(tango, pool):
+    tango.add("OmsVme58", "p09/motor/eh.01", "p09/motor/eh.02")
+    motors = pool(HasyMotorCtrl, [1, 2], RootDeviceName="p09/motor/eh")
+    assert motors.move({1: 0.5, 2: -0.2}) == {1: 0.5, 2: -0.2}
+
+
+def test_motor_state_of_all_axes_concurrently(tango, pool):
+    tango.add("OmsVme58", *["p09/motor/eh.%02d" % i for i in range(1, 9)])
+    motors = pool(HasyMotorCtrl, range(1, 9), RootDeviceName="p09/motor/eh")
+    tango.latency = 0.01
+    tango.reset_counters()
+    motors.state()
+    # State and the limit switches of an axis in one request
+    assert tango.round_trips == 8
+    assert motors.ctrl_time < 0.04
+
+
+def test_motor_parameters_are_cached(tango, pool):
+    tango.add("OmsVme58", "p09/motor/eh.01")
+    motors = pool(HasyMotorCtrl, [1], RootDeviceName="p09/motor/eh")
+    assert motors.ctrl.GetAxisPar(1, "velocity") == 100.
+    tango.reset_counters()
+    assert motors.ctrl.GetAxisPar(1, "velocity") == 100.
+    assert motors.ctrl.GetAxisPar(1, "step_per_unit") == 1000.
+    assert tango.round_trips == 0
+    motors.ctrl.SetAxisPar(1, "velocity", 50.)
+    assert motors.ctrl.GetAxisPar(1, "velocity") == 50.
+
+
+def test_sis3610_ioregister(tango, pool):
+    register = tango.add("SIS3610In", "p09/sis3610/eh.01")
+    io = pool(SIS3610Ctrl, [1], RootDeviceName="p09/sis3610")
+    io.call("WriteOne", 1, 5)
+    assert register.values["Value"] == 5
+    assert io.call("ReadOne", 1) == 5
+    assert io.state() == {1: ON}
+
+
+def test_mca2sca_calc(pool):
+    sca = pool(MCA2SCAsCtrl, [1, 2])
+    sca.ctrl.SetAxisExtraPar(1, "RoI1", 0)
+    sca.ctrl.SetAxisExtraPar(1, "RoI2", 4)
+    sca.ctrl.SetAxisExtraPar(2, "RoI1", 2)
+    sca.ctrl.SetAxisExtraPar(2, "RoI2", 8)
+    spectrum = numpy.arange(10)
+    assert sca.calc([spectrum]) == {1: 6., 2: 27.}
+    stats = json.loads(sca.ctrl.SendToCtrl("stats"))
+    assert stats["methods"]["Calc"]["calls"] == 2
+
+
+def test_deleted_axes_release_the_proxies(tango, pool):
+    add_eiger(tango)
+    eiger = pool(EigerDectrisCtrl, [1], RootDeviceName="p09/eiger/e4m")
+    assert len(HasyTangoLib._proxies) == 2
+    eiger.ctrl.DeleteDevice(1)
+    eiger.axes = []
+    assert HasyTangoLib._proxies == {}